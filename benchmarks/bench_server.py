@@ -0,0 +1,86 @@
+"""Compare throughput of a default `uvicorn main:app` launch with server.py.
+
+    python benchmarks/bench_server.py [--duration 10] [--concurrency 64]
+
+Both servers run against the database configured in .env. Results depend on
+the machine; the launcher's gain grows with the number of cores and with
+uvloop/httptools installed.
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+URL = "http://127.0.0.1:{port}/"
+
+LAUNCHES = {
+    "default uvicorn": [
+        sys.executable, "-m", "uvicorn", "main:app", "--port", "{port}"
+    ],
+    "server.py": [sys.executable, "server.py", "--port", "{port}"],
+}
+
+
+async def wait_until_ready(client, url, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            await client.get(url)
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+async def load(url, duration, concurrency):
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits) as client:
+        await wait_until_ready(client, url)
+        completed = 0
+        latencies = []
+        end = time.monotonic() + duration
+
+        async def user():
+            nonlocal completed
+            while time.monotonic() < end:
+                started = time.monotonic()
+                response = await client.get(url)
+                latencies.append(time.monotonic() - started)
+                if response.status_code == 200:
+                    completed += 1
+
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1] if latencies else 0.0
+    return completed / duration, p99
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    for name, command in LAUNCHES.items():
+        command = [part.format(port=args.port) for part in command]
+        server = subprocess.Popen(
+            command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            rps, p99 = asyncio.run(
+                load(URL.format(port=args.port), args.duration, args.concurrency)
+            )
+        finally:
+            server.terminate()
+            server.wait()
+        print(f"{name:>16}: {rps:8.0f} req/s   p99 {p99 * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Measure worker start-up: importing the app plus its startup handlers.
+
+    python benchmarks/bench_startup.py [--runs 10]
+
+Runs each mode in a fresh interpreter so nothing is cached in-process. The
+"alembic" mode needs the database migrated (`alembic upgrade head`).
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+main.init_db()
+ready = time.perf_counter()
+print(imported - started, ready - imported)
+"""
+
+
+def measure(mode, runs):
+    env = dict(os.environ, STARTUP_SCHEMA_CHECK=mode, DB_ECHO="false")
+    imports, inits = [], []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE],
+            cwd=ROOT,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.split()
+        imports.append(float(output[-2]) * 1000)
+        inits.append(float(output[-1]) * 1000)
+    return statistics.median(imports), statistics.median(inits)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    for mode in ("create_all", "alembic"):
+        imported, init = measure(mode, args.runs)
+        print(
+            f"{mode:>10}: import {imported:6.0f} ms + schema {init:5.0f} ms"
+            f" = ready in {imported + init:6.0f} ms (median of {args.runs})"
+        )
+
+
+if __name__ == "__main__":
+    main()
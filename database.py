@@ -1,23 +1,126 @@
 # database.py
+from fastapi import Depends
 from sqlmodel import SQLModel, create_engine, Session
-from dotenv import load_dotenv
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from utils.branches import get_branch_id, parse_branch_urls
+from utils.env import load_env
 import os
+import re
 
 
-load_dotenv()
+load_env()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+# SQL echo is handy locally but costly under load; server.py turns it off.
+DB_ECHO = os.getenv("DB_ECHO", "true").lower() == "true"
+# Per-process pool; server.py splits DB_MAX_CONNECTIONS across workers.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 3600))
+# "create_all" (default) creates missing tables on boot; "alembic" only checks
+# that the database is at the latest migration, which is much cheaper.
+STARTUP_SCHEMA_CHECK = os.getenv("STARTUP_SCHEMA_CHECK", "create_all")
+# Branches served from their own database, e.g. "2=mysql+pymysql://...;3=...".
+# Every other branch lives in DATABASE_URL.
+BRANCH_DATABASE_URLS = parse_branch_urls(os.getenv("BRANCH_DATABASE_URLS", ""))
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+
+def _create_engine(url: str):
+    pool_options = {}
+    if not url.startswith("sqlite"):
+        pool_options = {
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            # MySQL closes idle connections after wait_timeout
+            "pool_recycle": DB_POOL_RECYCLE,
+            "pool_pre_ping": True,
+        }
+    return create_engine(url, echo=DB_ECHO, **pool_options)
+
 
 # Create database engine
-engine = create_engine(DATABASE_URL, echo=True)
+engine = _create_engine(DATABASE_URL)
+# Branches sharing a URL share an engine (and its pool)
+_engines_by_url = {DATABASE_URL: engine}
+branch_engines = {}
+for _branch_id, _url in BRANCH_DATABASE_URLS.items():
+    if _url not in _engines_by_url:
+        _engines_by_url[_url] = _create_engine(_url)
+    branch_engines[_branch_id] = _engines_by_url[_url]
+
+
+def engine_for_branch(branch_id: int):
+    return branch_engines.get(branch_id, engine)
+
+
+def all_engines() -> list:
+    return list(_engines_by_url.values())
 
 
 # Function to initialize the database
 def init_db():
-    SQLModel.metadata.create_all(engine)
+    for bind in all_engines():
+        if STARTUP_SCHEMA_CHECK == "alembic":
+            check_schema_revision(bind)
+        else:
+            SQLModel.metadata.create_all(bind)
+
+
+def alembic_config():
+    from alembic.config import Config
+
+    config = Config(os.path.join(BASE_DIR, "alembic.ini"))
+    # Resolve migrations/ from the project root, whatever the working directory
+    config.set_main_option("script_location", os.path.join(BASE_DIR, "migrations"))
+    return config
+
+
+# One SELECT on alembic_version instead of reflecting every table. Importing
+# alembic itself costs more than the check, so the expected head is read
+# straight from the revision files (see migrations/script.py.mako).
+def migration_heads() -> set[str]:
+    versions_dir = os.path.join(BASE_DIR, "migrations", "versions")
+    revisions, parents = set(), set()
+    for name in os.listdir(versions_dir):
+        if not name.endswith(".py"):
+            continue
+        with open(os.path.join(versions_dir, name)) as revision_file:
+            for line in revision_file:
+                if line.startswith("revision:"):
+                    revisions.update(re.findall(r"'([^']+)'", line))
+                elif line.startswith("down_revision:"):
+                    parents.update(re.findall(r"'([^']+)'", line))
+    return revisions - parents
+
+
+def check_schema_revision(bind):
+    try:
+        with bind.connect() as connection:
+            current = set(
+                connection.execute(text("SELECT version_num FROM alembic_version"))
+                .scalars()
+                .all()
+            )
+    except (OperationalError, ProgrammingError):  # no alembic_version table yet
+        current = set()
+    expected = migration_heads()
+    if current != expected:
+        raise RuntimeError(
+            f"Database schema is at {sorted(current) or 'no revision'}, "
+            f"expected {sorted(expected)}; run `alembic upgrade head`"
+        )
+
+
+# Every request session is opened here, by the dependency below and by
+# middleware that runs before routing (utils/profiling.py). Tests replace it.
+def open_session(branch_id: int) -> Session:
+    return Session(engine_for_branch(branch_id))
 
 
 # Dependency for database session
-def get_session():
-    with Session(engine) as session:
+def get_session(branch_id: int = Depends(get_branch_id)):
+    with open_session(branch_id) as session:
         yield session
@@ -1,13 +1,55 @@
+import os
 from fastapi import FastAPI
-from database import init_db
+from database import all_engines, engine, init_db
 from routes import auth, admin, user
+from utils.admission import AdmissionControlMiddleware, admission_stats
+from utils.audit import audit_log, create_sink
+from utils.compression import CompressionMiddleware
+from utils.idempotency import IdempotencyMiddleware
+from utils.holds import expire_holds
+from utils.overdue import sweep_overdue
+from utils.profiling import ProfilingMiddleware
+from utils.scheduler import scheduler
+from utils.security import shutdown_hash_pool
 
 app = FastAPI()
 
+# Middleware added last runs first.
+# Admin-only per-request profiling (`X-Profile: 1`); a header check otherwise.
+app.add_middleware(ProfilingMiddleware)
+# Replays stored responses for retried Idempotency-Key writes.
+app.add_middleware(IdempotencyMiddleware)
+# gzip/br/zstd for large JSON bodies; replays are compressed too.
+app.add_middleware(CompressionMiddleware)
+# Sheds load per route class (auth / write / read) before any work is done.
+app.add_middleware(AdmissionControlMiddleware)
+
+
+# Background maintenance. With several workers, SCHEDULER_LOCK_FILE (set by
+# server.py) lets only one of them run it.
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() == "true"
+scheduler.add_job(
+    "overdue_sweep", float(os.getenv("OVERDUE_SWEEP_INTERVAL", 900)), sweep_overdue
+)
+scheduler.add_job(
+    "hold_expiry", float(os.getenv("HOLD_SWEEP_INTERVAL", 300)), expire_holds
+)
+
 
 @app.on_event("startup")
 def on_startup():
     init_db()
+    audit_log.start(create_sink(engine))
+    if SCHEDULER_ENABLED:
+        scheduler.start(*all_engines())
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    scheduler.stop()
+    # Flushes every event still queued
+    audit_log.stop()
+    shutdown_hash_pool()
 
 
 app.include_router(auth.router)
@@ -18,3 +60,9 @@ app.include_router(user.router)
 @app.get("/")
 def root():
     return {"message": "Welcome to the FastAPI Library Management System"}
+
+
+# Queue depth and shed counters per route class
+@app.get("/metrics/admission")
+def admission_metrics():
+    return admission_stats()
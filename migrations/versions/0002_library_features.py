@@ -0,0 +1,197 @@
+"""library features
+
+Copies, holds, due dates and fines, the borrow archive and the audit log.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 15:47:43.244347
+
+"""
+import os
+from datetime import timedelta
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('auditlog',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('event', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('actor_id', sa.Integer(), nullable=True),
+    sa.Column('target', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('details', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_auditlog_created_at'), 'auditlog', ['created_at'], unique=False)
+    op.create_index(op.f('ix_auditlog_event'), 'auditlog', ['event'], unique=False)
+    op.create_table('borrowarchive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('book_id', sa.Integer(), nullable=False),
+    sa.Column('copy_id', sa.Integer(), nullable=True),
+    sa.Column('borrowed_at', sa.DateTime(), nullable=False),
+    sa.Column('due_at', sa.DateTime(), nullable=True),
+    sa.Column('returned_at', sa.DateTime(), nullable=False),
+    sa.Column('fine_cents', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_borrowarchive_borrowed_at'), 'borrowarchive', ['borrowed_at'], unique=False)
+    op.create_index(op.f('ix_borrowarchive_user_id'), 'borrowarchive', ['user_id'], unique=False)
+    op.create_table('bookcopy',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('book_id', sa.Integer(), nullable=False),
+    sa.Column('available', sa.Boolean(), nullable=False),
+    sa.Column('withdrawn', sa.Boolean(), nullable=False),
+    sa.ForeignKeyConstraint(['book_id'], ['book.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_bookcopy_book_id'), 'bookcopy', ['book_id'], unique=False)
+    op.create_table('hold',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('book_id', sa.Integer(), nullable=False),
+    sa.Column('copy_id', sa.Integer(), nullable=True),
+    sa.Column('status', sa.Enum('waiting', 'ready', 'fulfilled', 'expired', 'cancelled', name='holdstatus'), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('ready_at', sa.DateTime(), nullable=True),
+    sa.Column('expires_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['book_id'], ['book.id'], ),
+    sa.ForeignKeyConstraint(['copy_id'], ['bookcopy.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_hold_book_status_created', 'hold', ['book_id', 'status', 'created_at'], unique=False)
+    op.create_index('ix_hold_status_expires', 'hold', ['status', 'expires_at'], unique=False)
+    op.create_index(op.f('ix_hold_user_id'), 'hold', ['user_id'], unique=False)
+
+    # Existing tables. The server defaults only fill rows that are already
+    # there and are dropped again, as the models do not declare them.
+    with op.batch_alter_table('book') as batch_op:
+        batch_op.add_column(sa.Column('total_copies', sa.Integer(), server_default='1', nullable=False))
+        batch_op.add_column(sa.Column('available_copies', sa.Integer(), server_default='1', nullable=False))
+    with op.batch_alter_table('borrow') as batch_op:
+        batch_op.add_column(sa.Column('copy_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('due_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('fine_cents', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('overdue_notified_at', sa.DateTime(), nullable=True))
+        batch_op.create_foreign_key('fk_borrow_copy_id_bookcopy', 'bookcopy', ['copy_id'], ['id'])
+        batch_op.create_index('ix_borrow_returned_due', ['returned_at', 'due_at'], unique=False)
+
+    _convert_availability()
+    _backfill_due_dates()
+
+    with op.batch_alter_table('book') as batch_op:
+        batch_op.alter_column('total_copies', server_default=None)
+        batch_op.alter_column('available_copies', server_default=None)
+        batch_op.drop_column('available')
+    with op.batch_alter_table('borrow') as batch_op:
+        batch_op.alter_column('fine_cents', server_default=None)
+
+
+def _convert_availability():
+    """Each existing title is one copy: on the shelf if the old `available`
+    flag was set and no loan is open, otherwise out. Open loans are pointed
+    at that copy so returning them puts it back."""
+    book = sa.table('book', sa.column('id'), sa.column('available'),
+                    sa.column('total_copies'), sa.column('available_copies'))
+    borrow = sa.table('borrow', sa.column('id'), sa.column('book_id'),
+                      sa.column('copy_id'), sa.column('returned_at'))
+    bookcopy = sa.table('bookcopy', sa.column('id'), sa.column('book_id'),
+                        sa.column('available'), sa.column('withdrawn'))
+
+    on_loan = (
+        sa.exists()
+        .where(borrow.c.book_id == book.c.id, borrow.c.returned_at.is_(None))
+    )
+    op.execute(
+        book.update().values(
+            total_copies=1,
+            available_copies=sa.case(
+                (sa.and_(book.c.available == sa.true(), ~on_loan), 1), else_=0
+            ),
+        )
+    )
+    op.execute(
+        bookcopy.insert().from_select(
+            ['book_id', 'available', 'withdrawn'],
+            sa.select(
+                book.c.id,
+                sa.case((book.c.available_copies > 0, sa.true()), else_=sa.false()),
+                sa.false(),
+            ),
+        )
+    )
+    op.execute(
+        borrow.update()
+        .where(borrow.c.returned_at.is_(None))
+        .values(
+            copy_id=sa.select(sa.func.min(bookcopy.c.id))
+            .where(bookcopy.c.book_id == borrow.c.book_id)
+            .scalar_subquery()
+        )
+    )
+
+
+def _backfill_due_dates():
+    """Open loans get the due date they would have had, so the overdue sweep
+    (which only looks at `due_at < now`) picks them up."""
+    loan_period = timedelta(days=int(os.getenv('LOAN_PERIOD_DAYS', 14)))
+    borrow = sa.table('borrow', sa.column('id'),
+                      sa.column('borrowed_at', sa.DateTime()),
+                      sa.column('due_at', sa.DateTime()), sa.column('returned_at'))
+    connection = op.get_bind()
+    loans = connection.execute(
+        sa.select(borrow.c.id, borrow.c.borrowed_at)
+        .where(borrow.c.returned_at.is_(None))
+    ).all()
+    if loans:
+        connection.execute(
+            borrow.update()
+            .where(borrow.c.id == sa.bindparam('loan_id'))
+            .values(due_at=sa.bindparam('due_at')),
+            [{'loan_id': loan_id, 'due_at': borrowed_at + loan_period}
+             for loan_id, borrowed_at in loans],
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('book') as batch_op:
+        batch_op.add_column(sa.Column('available', sa.Boolean(), server_default=sa.true(), nullable=False))
+    op.execute(
+        "UPDATE book SET available = CASE WHEN available_copies > 0 "
+        "THEN 1 ELSE 0 END"
+    )
+    with op.batch_alter_table('book') as batch_op:
+        batch_op.alter_column('available', server_default=None)
+        batch_op.drop_column('available_copies')
+        batch_op.drop_column('total_copies')
+    with op.batch_alter_table('borrow') as batch_op:
+        batch_op.drop_index('ix_borrow_returned_due')
+        batch_op.drop_constraint('fk_borrow_copy_id_bookcopy', type_='foreignkey')
+        batch_op.drop_column('overdue_notified_at')
+        batch_op.drop_column('fine_cents')
+        batch_op.drop_column('due_at')
+        batch_op.drop_column('copy_id')
+    op.drop_index(op.f('ix_hold_user_id'), table_name='hold')
+    op.drop_index('ix_hold_status_expires', table_name='hold')
+    op.drop_index('ix_hold_book_status_created', table_name='hold')
+    op.drop_table('hold')
+    op.drop_index(op.f('ix_bookcopy_book_id'), table_name='bookcopy')
+    op.drop_table('bookcopy')
+    op.drop_index(op.f('ix_borrowarchive_user_id'), table_name='borrowarchive')
+    op.drop_index(op.f('ix_borrowarchive_borrowed_at'), table_name='borrowarchive')
+    op.drop_table('borrowarchive')
+    op.drop_index(op.f('ix_auditlog_event'), table_name='auditlog')
+    op.drop_index(op.f('ix_auditlog_created_at'), table_name='auditlog')
+    op.drop_table('auditlog')
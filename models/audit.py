@@ -0,0 +1,12 @@
+from sqlmodel import SQLModel, Field
+from datetime import datetime
+
+
+# Append-only; written in batches by utils/audit.py
+class AuditLog(SQLModel, table=True):
+    id: int = Field(default=None, primary_key=True)
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    event: str = Field(index=True)
+    actor_id: int | None = Field(default=None, nullable=True)
+    target: str | None = Field(default=None, nullable=True)
+    details: str | None = Field(default=None, nullable=True)  # JSON
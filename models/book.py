@@ -1,9 +1,32 @@
 from sqlmodel import SQLModel, Field
+from sqlalchemy import Index
 
 
 class Book(SQLModel, table=True):
+    __table_args__ = (
+        # Catalog queries are always scoped to one branch; an ISBN is unique
+        # within a branch, and each branch keeps its own copy of the title.
+        Index("ix_book_branch_isbn", "branch_id", "isbn", unique=True),
+        Index("ix_book_branch_title", "branch_id", "title"),
+    )
+
     id: int = Field(default=None, primary_key=True)
+    branch_id: int = Field(default=1, sa_column_kwargs={"server_default": "1"})
     title: str
     author: str
-    isbn: str = Field(unique=True, index=True)
+    isbn: str
+    # Counters are only changed with guarded UPDATEs in utils/inventory.py
+    total_copies: int = Field(default=1)
+    available_copies: int = Field(default=1)
+
+    @property
+    def available(self) -> bool:
+        return self.available_copies > 0
+
+
+# One physical copy of a title
+class BookCopy(SQLModel, table=True):
+    id: int = Field(default=None, primary_key=True)
+    book_id: int = Field(foreign_key="book.id", index=True)
     available: bool = Field(default=True)
+    withdrawn: bool = Field(default=False)
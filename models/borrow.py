@@ -1,10 +1,39 @@
 from sqlmodel import SQLModel, Field
+from sqlalchemy import Index
 from datetime import datetime
 
 
 class Borrow(SQLModel, table=True):
+    __table_args__ = (
+        # Open loans are `returned_at IS NULL`; the overdue sweep pages
+        # through them in due_at order on this index.
+        Index("ix_borrow_returned_due", "returned_at", "due_at"),
+        Index("ix_borrow_branch_user", "branch_id", "user_id", "borrowed_at"),
+        Index("ix_borrow_branch_book", "branch_id", "book_id", "returned_at"),
+    )
+
     id: int = Field(default=None, primary_key=True)
+    branch_id: int = Field(default=1, sa_column_kwargs={"server_default": "1"})
     user_id: int = Field(foreign_key="user.id")
     book_id: int = Field(foreign_key="book.id")
+    copy_id: int | None = Field(default=None, foreign_key="bookcopy.id", nullable=True)
     borrowed_at: datetime = Field(default_factory=datetime.utcnow)
+    due_at: datetime | None = Field(default=None, nullable=True)
     returned_at: datetime = Field(default=None, nullable=True)
+    fine_cents: int = Field(default=0)
+    overdue_notified_at: datetime | None = Field(default=None, nullable=True)
+
+
+# Returned loans moved out of the hot `borrow` table by utils/archival.py.
+# Rows keep their original ids; there are no foreign keys so archived history
+# survives deletion of the book or user it refers to.
+class BorrowArchive(SQLModel, table=True):
+    id: int = Field(primary_key=True, sa_column_kwargs={"autoincrement": False})
+    branch_id: int = Field(default=1, sa_column_kwargs={"server_default": "1"})
+    user_id: int = Field(index=True)
+    book_id: int
+    copy_id: int | None = None
+    borrowed_at: datetime = Field(index=True)
+    due_at: datetime | None = None
+    returned_at: datetime
+    fine_cents: int = 0
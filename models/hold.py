@@ -0,0 +1,29 @@
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Index
+from datetime import datetime
+from enum import Enum
+
+
+class HoldStatus(str, Enum):
+    waiting = "waiting"  # in the queue for the next returned copy
+    ready = "ready"  # a copy is set aside until expires_at
+    fulfilled = "fulfilled"  # the holder borrowed the copy
+    expired = "expired"  # not picked up in time
+    cancelled = "cancelled"
+
+
+class Hold(SQLModel, table=True):
+    __table_args__ = (
+        # FIFO per book: the next waiting hold is the first entry in this index
+        Index("ix_hold_book_status_created", "book_id", "status", "created_at"),
+        Index("ix_hold_status_expires", "status", "expires_at"),
+    )
+
+    id: int = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.id", index=True)
+    book_id: int = Field(foreign_key="book.id")
+    copy_id: int | None = Field(default=None, foreign_key="bookcopy.id", nullable=True)
+    status: HoldStatus = Field(default=HoldStatus.waiting)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    ready_at: datetime | None = Field(default=None, nullable=True)
+    expires_at: datetime | None = Field(default=None, nullable=True)
@@ -0,0 +1,19 @@
+from sqlmodel import SQLModel, Field
+from datetime import datetime
+
+
+# "Readers also borrowed": the top neighbours of each book, rebuilt offline by
+# utils/recommendations.py. The (book_id, rank) primary key makes serving one
+# range read. No foreign keys, so a rebuild never has to lock `book`.
+class BookNeighbour(SQLModel, table=True):
+    book_id: int = Field(primary_key=True, sa_column_kwargs={"autoincrement": False})
+    rank: int = Field(primary_key=True, sa_column_kwargs={"autoincrement": False})
+    neighbour_id: int
+    score: float
+
+
+# Single row recording how far into `borrow` the neighbours are up to date
+class RecommendationState(SQLModel, table=True):
+    id: int = Field(default=1, primary_key=True)
+    last_borrow_id: int = Field(default=0)
+    built_at: datetime | None = Field(default=None, nullable=True)
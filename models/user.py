@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, Field
+from sqlalchemy import Index
 from enum import Enum
 
 
@@ -8,8 +9,12 @@ class RoleEnum(str, Enum):
 
 
 class User(SQLModel, table=True):
+    __table_args__ = (Index("ix_user_branch_username", "branch_id", "username"),)
+
     id: int = Field(default=None, primary_key=True)
     username: str = Field(unique=True, index=True)
     email: str = Field(unique=True, index=True)
     hashed_password: str
     role: RoleEnum = Field(default=RoleEnum.member)
+    # Library branch the account belongs to (see utils/branches.py)
+    branch_id: int = Field(default=1, sa_column_kwargs={"server_default": "1"})
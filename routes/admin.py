@@ -1,12 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
 from sqlmodel import Session, select
+from sqlalchemy import delete
 from sqlalchemy.exc import IntegrityError
-from models.book import Book
+from models.book import Book, BookCopy
+from models.recommendation import BookNeighbour
 from schemas.book import BookCreate, BookResponse
+from schemas.user import BulkUserReport
 from database import get_session
+from utils.audit import audit_log
 from utils.dependencies import is_admin
+from utils.holds import release_added_copies
+from utils.inventory import add_copies, withdraw_copies
+from utils.profiling import ProfiledRoute, store as profile_store
+from utils.provisioning import BULK_USERS_MAX_ROWS, parse_rows, provision_users
 
-router = APIRouter(prefix="/admin", tags=["Admin"])
+router = APIRouter(prefix="/admin", tags=["Admin"], route_class=ProfiledRoute)
 
 
 @router.post("/books", response_model=BookResponse, status_code=status.HTTP_201_CREATED)
@@ -22,11 +31,21 @@ def add_book(
 
     try:
         book = Book(
-            title=book_data.title, author=book_data.author, isbn=str(book_data.isbn)
+            branch_id=admin.branch_id,
+            title=book_data.title,
+            author=book_data.author,
+            isbn=str(book_data.isbn),
+            total_copies=0,
+            available_copies=0,
         )
         db.add(book)
+        db.flush()
+        add_copies(db, book, book_data.copies or 1)
         db.commit()
         db.refresh(book)
+        audit_log.record(
+            "book.created", actor_id=admin.id, target=f"book:{book.id}", isbn=book.isbn
+        )
         return book
     except IntegrityError:
         db.rollback()
@@ -41,7 +60,9 @@ def update_book(
     db: Session = Depends(get_session),
     admin=Depends(is_admin),
 ):
-    book = db.exec(select(Book).where(Book.id == book_id)).first()
+    book = db.exec(
+        select(Book).where(Book.id == book_id, Book.branch_id == admin.branch_id)
+    ).first()
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
 
@@ -56,8 +77,24 @@ def update_book(
         book.title = book_data.title
         book.author = book_data.author
         book.isbn = book_data.isbn
+        if book_data.copies is not None:
+            change = book_data.copies - book.total_copies
+            if change > 0:
+                add_copies(db, book, change)
+                release_added_copies(db, book.id, change)
+            elif change < 0 and not withdraw_copies(db, book, -change):
+                db.rollback()
+                raise HTTPException(
+                    status_code=400, detail="Cannot remove copies that are on loan"
+                )
         db.commit()
         db.refresh(book)
+        audit_log.record(
+            "book.updated",
+            actor_id=admin.id,
+            target=f"book:{book.id}",
+            copies=book.total_copies,
+        )
         return book
     except IntegrityError:
         db.rollback()
@@ -69,19 +106,24 @@ def update_book(
 def delete_book(
     book_id: int, db: Session = Depends(get_session), admin=Depends(is_admin)
 ):
-    book = db.exec(select(Book).where(Book.id == book_id)).first()
+    book = db.exec(
+        select(Book).where(Book.id == book_id, Book.branch_id == admin.branch_id)
+    ).first()
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
 
+    db.exec(delete(BookCopy).where(BookCopy.book_id == book_id))
+    db.exec(delete(BookNeighbour).where(BookNeighbour.book_id == book_id))
     db.delete(book)
     db.commit()
+    audit_log.record("book.deleted", actor_id=admin.id, target=f"book:{book_id}")
     return {"message": "Book deleted successfully"}
 
 
 # View all books
 @router.get("/books", response_model=list[BookResponse])
 def get_books(db: Session = Depends(get_session), admin=Depends(is_admin)):
-    books = db.exec(select(Book)).all()
+    books = db.exec(select(Book).where(Book.branch_id == admin.branch_id)).all()
     if not books:
         raise HTTPException(status_code=404, detail="No books found")
     return books
@@ -90,8 +132,54 @@ def get_books(db: Session = Depends(get_session), admin=Depends(is_admin)):
 # Get book details
 @router.get("/books/{book_id}", response_model=BookResponse)
 def get_book(book_id: int, db: Session = Depends(get_session), admin=Depends(is_admin)):
-    book = db.exec(select(Book).where(Book.id == book_id)).first()
+    book = db.exec(
+        select(Book).where(Book.id == book_id, Book.branch_id == admin.branch_id)
+    ).first()
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
 
     return book
+
+
+# Create many members at once from a JSON array or a CSV upload (text/csv)
+@router.post("/users/bulk", response_model=BulkUserReport)
+async def bulk_create_users(
+    request: Request, db: Session = Depends(get_session), admin=Depends(is_admin)
+):
+    try:
+        rows = parse_rows(await request.body(), request.headers.get("content-type", ""))
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(
+            status_code=400, detail="Body must be a JSON array of users or a CSV file"
+        )
+    if not rows:
+        raise HTTPException(status_code=400, detail="No users provided")
+    if len(rows) > BULK_USERS_MAX_ROWS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {BULK_USERS_MAX_ROWS} users can be created at once",
+        )
+
+    # Hashing and inserts are blocking; keep them off the event loop
+    report = await run_in_threadpool(provision_users, db, rows, admin.branch_id)
+    audit_log.record(
+        "users.bulk_created",
+        actor_id=admin.id,
+        created=report.created,
+        failed=report.failed,
+    )
+    return report
+
+
+# Reports of requests sent with `X-Profile: 1`, newest first
+@router.get("/profiles")
+def list_profiles(admin=Depends(is_admin)):
+    return profile_store.list()
+
+
+@router.get("/profiles/{profile_id}")
+def get_profile(profile_id: str, admin=Depends(is_admin)):
+    report = profile_store.get(profile_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return report
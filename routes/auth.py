@@ -10,18 +10,31 @@ from utils.security import (
     create_access_token,
     verify_token,
 )
+from utils.rate_limit import limit_login_attempts, limit_signup_attempts
+from utils.audit import audit_log
+from utils.branches import DEFAULT_BRANCH_ID, get_branch_id
+from utils.profiling import ProfiledRoute
 from datetime import timedelta
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.exc import IntegrityError
 
 
-router = APIRouter(prefix="/auth", tags=["Authentication"])
+router = APIRouter(prefix="/auth", tags=["Authentication"], route_class=ProfiledRoute)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 
-@router.post("/signup", response_model=UserResponse, status_code=status.HTTP_200_OK)
-def register_user(user_data: UserCreate, db: Session = Depends(get_session)):
+@router.post(
+    "/signup",
+    response_model=UserResponse,
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(limit_signup_attempts)],
+)
+def register_user(
+    user_data: UserCreate,
+    db: Session = Depends(get_session),
+    branch_id: int = Depends(get_branch_id),
+):
     if not user_data.username.strip():
         raise HTTPException(status_code=400, detail="Username cannot be empty")
     if not user_data.email.strip():
@@ -39,26 +52,32 @@ def register_user(user_data: UserCreate, db: Session = Depends(get_session)):
         email=user_data.email,
         hashed_password=hashed_password,
         role=user_data.role,
+        branch_id=branch_id,
     )
 
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
+    audit_log.record("auth.signup", actor_id=new_user.id, target=f"user:{new_user.id}")
 
     return new_user
 
 
 # Login
-@router.post("/login")
+@router.post("/login", dependencies=[Depends(limit_login_attempts)])
 def login(
     form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_session)
 ):
     user = db.exec(select(User).where(User.email == form_data.username)).first()
     if not user or not verify_password(form_data.password, user.hashed_password):
+        audit_log.record("auth.login_failed", email=form_data.username)
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    audit_log.record("auth.login", actor_id=user.id, target=f"user:{user.id}")
 
+    # The branch claim scopes (and routes) every later request of this user
     access_token = create_access_token(
-        {"sub": str(user.id), "role": user.role}, expires_delta=timedelta(minutes=30)
+        {"sub": str(user.id), "role": user.role, "branch": user.branch_id},
+        expires_delta=timedelta(minutes=30),
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
@@ -87,7 +106,11 @@ def refresh_token(token: str = Depends(oauth2_scheme)):
         raise HTTPException(status_code=401, detail="Invalid or expired token")
 
     new_access_token = create_access_token(
-        {"sub": payload["sub"], "role": payload["role"]},
+        {
+            "sub": payload["sub"],
+            "role": payload["role"],
+            "branch": payload.get("branch", DEFAULT_BRANCH_ID),
+        },
         expires_delta=timedelta(minutes=30),
     )
     return {"access_token": new_access_token, "token_type": "bearer"}
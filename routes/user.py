@@ -1,47 +1,177 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlmodel import Session, select
 from models.book import Book
 from models.borrow import Borrow
-from schemas.book import BookResponse
+from models.hold import Hold
+from models.recommendation import BookNeighbour
+from schemas.book import (
+    MAX_BATCH_IDS,
+    BookBatchRequest,
+    BookBatchResponse,
+    BookResponse,
+    RelatedBookResponse,
+)
 from schemas.borrow import BorrowResponse
+from schemas.hold import HoldResponse
 from database import get_session
 from utils.dependencies import get_current_user
+from utils.archival import user_history
+from utils.audit import audit_log
+from utils.branches import get_branch_id
+from utils.holds import (
+    ACTIVE_STATUSES,
+    active_hold,
+    cancel_hold,
+    claim_ready_hold,
+    fulfil_waiting_hold,
+    queued_ahead,
+    release_copy,
+)
+from utils.inventory import checkout_copy
+from utils.overdue import compute_fine, due_date
+from utils.profiling import ProfiledRoute
 from datetime import datetime
 
-router = APIRouter(prefix="/books", tags=["User"])
+router = APIRouter(prefix="/books", tags=["User"], route_class=ProfiledRoute)
 
 
 # Browse books
 @router.get("/", response_model=list[BookResponse], status_code=status.HTTP_200_OK)
-def browse_books(db: Session = Depends(get_session)):
-    books = db.exec(select(Book)).all()
+def browse_books(
+    db: Session = Depends(get_session), branch_id: int = Depends(get_branch_id)
+):
+    books = db.exec(select(Book).where(Book.branch_id == branch_id)).all()
     print("Browse Books Route Output:", books)
     return books
 
 
+def _lookup_books(db: Session, branch_id: int, ids: list[int]) -> BookBatchResponse:
+    # One IN (...) query; results follow request order, duplicates collapse.
+    # Books of other branches are reported as missing.
+    ids = list(dict.fromkeys(ids))
+    books = db.exec(
+        select(Book).where(Book.branch_id == branch_id, Book.id.in_(ids))
+    ).all()
+    found = {book.id: book for book in books}
+    return BookBatchResponse(
+        books=[found[book_id] for book_id in ids if book_id in found],
+        missing=[book_id for book_id in ids if book_id not in found],
+    )
+
+
+# Look up several books at once, e.g. /books/batch?ids=1,2,3
+@router.get("/batch", response_model=BookBatchResponse)
+def get_books_batch(
+    ids: str = Query(..., description="Comma-separated book ids"),
+    db: Session = Depends(get_session),
+    branch_id: int = Depends(get_branch_id),
+):
+    try:
+        book_ids = [int(book_id) for book_id in ids.split(",") if book_id.strip()]
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="ids must be a comma-separated list of integers",
+        )
+    if not book_ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="ids cannot be empty"
+        )
+    if len(book_ids) > MAX_BATCH_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_BATCH_IDS} ids can be requested at once",
+        )
+    return _lookup_books(db, branch_id, book_ids)
+
+
+# Same lookup with the ids in the body, for sets too large for a URL
+@router.post("/batch", response_model=BookBatchResponse)
+def post_books_batch(
+    batch: BookBatchRequest,
+    db: Session = Depends(get_session),
+    branch_id: int = Depends(get_branch_id),
+):
+    return _lookup_books(db, branch_id, batch.ids)
+
+
+# "Readers also borrowed", precomputed by utils/recommendations.py
+@router.get("/{book_id}/related", response_model=list[RelatedBookResponse])
+def related_books(
+    book_id: int,
+    db: Session = Depends(get_session),
+    branch_id: int = Depends(get_branch_id),
+):
+    rows = db.exec(
+        select(Book, BookNeighbour.score)
+        .join(BookNeighbour, BookNeighbour.neighbour_id == Book.id)
+        .where(BookNeighbour.book_id == book_id, Book.branch_id == branch_id)
+        .order_by(BookNeighbour.rank)
+    ).all()
+    if not rows:
+        book = db.get(Book, book_id)
+        if book is None or book.branch_id != branch_id:
+            raise HTTPException(status_code=404, detail="Book not found")
+    return [
+        RelatedBookResponse(
+            **BookResponse.model_validate(book).model_dump(), score=score
+        )
+        for book, score in rows
+    ]
+
+
 # Borrow a book
 @router.post("/{book_id}/borrow", response_model=BorrowResponse, status_code=status.HTTP_200_OK)
 def borrow_book(
     book_id: int, db: Session = Depends(get_session), user=Depends(get_current_user)
 ):
-    book = db.exec(select(Book).where(Book.id == book_id)).first()
+    book = db.exec(
+        select(Book).where(Book.id == book_id, Book.branch_id == user.branch_id)
+    ).first()
     if not book:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Book not found"
         )
-    if not book.available:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="Book is not available"
-        )
+
+    hold = claim_ready_hold(db, user.id, book_id)
+    if hold:
+        # The copy was set aside for this user when it was returned
+        copy_id = hold.copy_id
+    else:
+        if queued_ahead(db, user.id, book_id):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Book is reserved for members on the waiting list",
+            )
+        # Guarded decrement; fails when no copy is left, even under concurrency
+        reserved, copy_id = checkout_copy(db, book_id)
+        if not reserved:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Book is not available",
+            )
+        # The user's own place in the queue is served by this loan
+        fulfil_waiting_hold(db, user.id, book_id)
 
     try:
-        book.available = False
+        borrowed_at = datetime.utcnow()
         borrow_entry = Borrow(
-            user_id=user.id, book_id=book_id, borrowed_at=datetime.utcnow()
+            branch_id=user.branch_id,
+            user_id=user.id,
+            book_id=book_id,
+            copy_id=copy_id,
+            borrowed_at=borrowed_at,
+            due_at=due_date(borrowed_at),
         )
         db.add(borrow_entry)
         db.commit()
         db.refresh(borrow_entry)
+        audit_log.record(
+            "book.borrowed",
+            actor_id=user.id,
+            target=f"book:{book_id}",
+            borrow_id=borrow_entry.id,
+        )
         return borrow_entry
     except Exception as e:
         db.rollback()
@@ -56,6 +186,7 @@ def return_book(
 ):
     borrow_entry = db.exec(
         select(Borrow).where(
+            Borrow.branch_id == user.branch_id,
             Borrow.book_id == book_id,
             Borrow.user_id == user.id,
             Borrow.returned_at == None,
@@ -64,7 +195,9 @@ def return_book(
 
     if not borrow_entry:
         # Instead of checking for the book first, check if it even exists in the system
-        book = db.exec(select(Book).where(Book.id == book_id)).first()
+        book = db.exec(
+            select(Book).where(Book.id == book_id, Book.branch_id == user.branch_id)
+        ).first()
         if not book:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Book not found"
@@ -76,9 +209,19 @@ def return_book(
 
     try:
         borrow_entry.returned_at = datetime.utcnow()
-        book = db.exec(select(Book).where(Book.id == book_id)).first()
-        book.available = True
+        borrow_entry.fine_cents = compute_fine(
+            borrow_entry.due_at, borrow_entry.returned_at
+        )
+        # Hands the copy to the next hold in the same transaction, if any
+        release_copy(db, book_id, borrow_entry.copy_id)
+        borrow_id = borrow_entry.id
         db.commit()
+        audit_log.record(
+            "book.returned",
+            actor_id=user.id,
+            target=f"book:{book_id}",
+            borrow_id=borrow_id,
+        )
         return {"message": "Book returned successfully"}
     except Exception as e:
         db.rollback()
@@ -87,10 +230,72 @@ def return_book(
         )
 
 
+# Join the waiting list of a book that is currently out
+@router.post("/{book_id}/hold", response_model=HoldResponse)
+def place_hold(
+    book_id: int, db: Session = Depends(get_session), user=Depends(get_current_user)
+):
+    book = db.exec(
+        select(Book).where(Book.id == book_id, Book.branch_id == user.branch_id)
+    ).first()
+    if not book:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Book not found"
+        )
+    if book.available:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Book is available, borrow it instead",
+        )
+    if active_hold(db, user.id, book_id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="You already have a hold on this book",
+        )
+
+    hold = Hold(user_id=user.id, book_id=book_id)
+    db.add(hold)
+    db.commit()
+    db.refresh(hold)
+    return hold
+
+
+# Leave the waiting list (or give up a copy set aside for you)
+@router.delete("/{book_id}/hold")
+def remove_hold(
+    book_id: int, db: Session = Depends(get_session), user=Depends(get_current_user)
+):
+    hold = active_hold(db, user.id, book_id)
+    if not hold:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="No active hold found"
+        )
+
+    if not cancel_hold(db, hold):
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="No active hold found"
+        )
+    db.commit()
+    return {"message": "Hold cancelled successfully"}
+
+
+# View active holds
+@router.get("/holds", response_model=list[HoldResponse])
+def list_holds(db: Session = Depends(get_session), user=Depends(get_current_user)):
+    return db.exec(
+        select(Hold)
+        .where(Hold.user_id == user.id, Hold.status.in_(ACTIVE_STATUSES))
+        .order_by(Hold.created_at)
+    ).all()
+
+
 # View borrowing history
 @router.get("/history", response_model=list[BorrowResponse])
 def borrowing_history(
-    db: Session = Depends(get_session), user=Depends(get_current_user)
+    since: datetime | None = None,
+    db: Session = Depends(get_session),
+    user=Depends(get_current_user),
 ):
-    history = db.exec(select(Borrow).where(Borrow.user_id == user.id)).all()
-    return history
+    # Archived loans are only read when `since` reaches back into the archive
+    return user_history(db, user.id, user.branch_id, since)
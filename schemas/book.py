@@ -6,6 +6,9 @@ class BookCreate(BaseModel):
     title: str = Field(..., min_length=1, description="Title cannot be empty")
     author: str = Field(..., min_length=1, description="Author cannot be empty")
     isbn: str = Field(..., min_length=1, description="ISBN must be a non-empty string")
+    copies: int | None = Field(
+        None, ge=1, description="Number of copies (1 for new books when omitted)"
+    )
 
 
 class BookResponse(BaseModel):
@@ -14,6 +17,25 @@ class BookResponse(BaseModel):
     author: str
     isbn: str
     available: bool
+    total_copies: int
+    available_copies: int
 
     class Config:
         from_attributes = True
+
+
+class RelatedBookResponse(BookResponse):
+    score: float
+
+
+# Upper bound on ids resolved by a single batch lookup
+MAX_BATCH_IDS = 500
+
+
+class BookBatchRequest(BaseModel):
+    ids: list[int] = Field(..., min_length=1, max_length=MAX_BATCH_IDS)
+
+
+class BookBatchResponse(BaseModel):
+    books: list[BookResponse]
+    missing: list[int]
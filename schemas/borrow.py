@@ -7,8 +7,11 @@ class BorrowResponse(BaseModel):
     id: int
     user_id: int
     book_id: int
+    copy_id: int | None = None
     borrowed_at: datetime
+    due_at: datetime | None = None
     returned_at: datetime | None = None
+    fine_cents: int = 0
 
     class Config:
         from_attributes = True
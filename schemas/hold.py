@@ -0,0 +1,16 @@
+from pydantic import BaseModel
+from datetime import datetime
+from models.hold import HoldStatus
+
+
+class HoldResponse(BaseModel):
+    id: int
+    user_id: int
+    book_id: int
+    status: HoldStatus
+    created_at: datetime
+    ready_at: datetime | None = None
+    expires_at: datetime | None = None
+
+    class Config:
+        from_attributes = True
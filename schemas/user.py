@@ -18,3 +18,18 @@ class UserResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class BulkUserResult(BaseModel):
+    row: int
+    username: str | None = None
+    email: str | None = None
+    status: str  # "created", "invalid", "duplicate" or "error"
+    id: int | None = None
+    detail: str | None = None
+
+
+class BulkUserReport(BaseModel):
+    created: int
+    failed: int
+    results: list[BulkUserResult]
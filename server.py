@@ -0,0 +1,158 @@
+# server.py
+"""Production entry point: python server.py [--workers N] [--port 8000] ...
+
+Workers are separate processes. Set IDEMPOTENCY_REDIS_URL and
+RATE_LIMIT_REDIS_URL so that idempotency keys and rate-limit buckets are
+shared between them rather than kept per worker.
+"""
+import argparse
+import importlib.util
+import os
+import tempfile
+
+APP = "main:app"
+
+
+def available_cpus() -> int:
+    """CPUs this process may use, honouring affinity and cgroup v2 quotas."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # not available on macOS / Windows
+        cpus = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as cpu_max:
+            quota, period = cpu_max.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, int(quota) // int(period)))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the library API")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", 8000)))
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.getenv("WEB_CONCURRENCY", 0)),
+        help="Worker processes (default: available CPUs)",
+    )
+    parser.add_argument(
+        "--server",
+        choices=["auto", "uvicorn", "gunicorn"],
+        default=os.getenv("SERVER", "auto"),
+        help="gunicorn preloads the app before forking; auto uses it if installed",
+    )
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument(
+        "--keep-alive",
+        type=int,
+        default=int(os.getenv("KEEP_ALIVE", 75)),
+        help="Idle keep-alive seconds; keep above the load balancer's idle timeout",
+    )
+    parser.add_argument(
+        "--graceful-timeout",
+        type=int,
+        default=int(os.getenv("GRACEFUL_TIMEOUT", 30)),
+        help="Seconds to finish in-flight requests on shutdown",
+    )
+    parser.add_argument(
+        "--forwarded-allow-ips",
+        default=os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1"),
+        help="Comma-separated proxy IPs (or *) whose X-Forwarded-For is trusted; "
+        "per-IP rate limits key on the resulting client address",
+    )
+    parser.add_argument(
+        "--db-max-connections",
+        type=int,
+        default=int(os.getenv("DB_MAX_CONNECTIONS", 0)),
+        help="Total DB connections for this pod, split evenly across workers",
+    )
+    return parser.parse_args()
+
+
+def configure_environment(args, workers: int):
+    # Read by database.py and main.py when each worker imports the app.
+    os.environ.setdefault("DB_ECHO", "false")
+    # Check the migration revision instead of running create_all on every boot
+    os.environ.setdefault("STARTUP_SCHEMA_CHECK", "alembic")
+    if args.db_max_connections:
+        os.environ["DB_POOL_SIZE"] = str(max(1, args.db_max_connections // workers))
+        os.environ["DB_MAX_OVERFLOW"] = "0"
+    if workers > 1:
+        # Only the worker holding this lock runs the background scheduler.
+        os.environ.setdefault(
+            "SCHEDULER_LOCK_FILE",
+            os.path.join(tempfile.gettempdir(), f"library-scheduler-{args.port}.lock"),
+        )
+
+
+def run_uvicorn(args, workers: int, loop: str, http: str):
+    import uvicorn
+
+    uvicorn.run(
+        APP,
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        loop=loop,
+        http=http,
+        backlog=args.backlog,
+        timeout_keep_alive=args.keep_alive,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        access_log=False,
+        proxy_headers=True,
+        forwarded_allow_ips=args.forwarded_allow_ips,
+    )
+
+
+def run_gunicorn(args, workers: int):
+    from gunicorn.app.base import BaseApplication
+
+    class Application(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{args.host}:{args.port}")
+            self.cfg.set("workers", workers)
+            # Uses uvloop/httptools automatically when they are installed
+            self.cfg.set("worker_class", "uvicorn.workers.UvicornWorker")
+            self.cfg.set("backlog", args.backlog)
+            self.cfg.set("keepalive", args.keep_alive)
+            self.cfg.set("graceful_timeout", args.graceful_timeout)
+            self.cfg.set("forwarded_allow_ips", args.forwarded_allow_ips)
+            # Import the app once in the master; workers fork with it loaded
+            self.cfg.set("preload_app", True)
+
+        def load(self):
+            from main import app
+
+            return app
+
+    Application().run()
+
+
+def main():
+    args = parse_args()
+    workers = args.workers or available_cpus()
+    configure_environment(args, workers)
+
+    server = args.server
+    if server == "auto":
+        server = "gunicorn" if installed("gunicorn") else "uvicorn"
+    loop = "uvloop" if installed("uvloop") else "asyncio"
+    http = "httptools" if installed("httptools") else "h11"
+    print(f"Starting {server} with {workers} workers (loop={loop}, http={http})")
+
+    if server == "gunicorn":
+        run_gunicorn(args, workers)
+    else:
+        run_uvicorn(args, workers, loop, http)
+
+
+if __name__ == "__main__":
+    main()
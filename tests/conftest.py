@@ -1,7 +1,7 @@
 import pytest
 from fastapi.testclient import TestClient
 from sqlmodel import SQLModel, create_engine, Session, select
-from database import get_session
+import database
 from main import app
 import os
 from dotenv import load_dotenv
@@ -9,6 +9,7 @@ from models.user import User
 from utils.security import (
     create_access_token,
 )
+from utils import idempotency, rate_limit
 
 
 load_dotenv()
@@ -33,17 +34,11 @@ def test_db():
 
 
 @pytest.fixture
-def test_client(test_db):
-    
-
-    def override_get_session():
-        try:
-            yield test_db
-        finally:
-            test_db.rollback()
-            test_db.close()
-
-    app.dependency_overrides[get_session] = override_get_session
+def test_client(test_db, monkeypatch):
+    # Routes and middleware all open their sessions through this factory
+    monkeypatch.setattr(database, "open_session", lambda branch_id: test_db)
+    rate_limit.backend.reset()
+    idempotency.store.reset()
     return TestClient(app)
 
 
@@ -1,6 +1,8 @@
 import pytest
 from fastapi import status
 
+from utils import security
+
 
 @pytest.fixture
 def admin_token(test_client):
@@ -105,3 +107,87 @@ def test_add_duplicate_isbn(test_client, admin_token):
         },
     )
     assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.admin
+def test_bulk_create_users(test_client, admin_token):
+    """Bulk provisioning reports created, duplicate and invalid rows."""
+    response = test_client.post(
+        "/admin/users/bulk",
+        headers={"Authorization": f"Bearer {admin_token}"},
+        json=[
+            {"username": "alice", "email": "alice@example.com", "password": "pw1"},
+            {"username": "bob", "email": "bob@example.com", "password": "pw2"},
+            {"username": "alice2", "email": "alice@example.com", "password": "pw3"},
+            {"username": "admin2", "email": "admin@example.com", "password": "pw4"},
+            {"username": "carol", "email": "not-an-email", "password": "pw5"},
+            {"username": 123, "email": "dan@example.com", "password": "pw6"},
+        ],
+    )
+
+    assert response.status_code == status.HTTP_200_OK, response.json()
+    report = response.json()
+    assert report["created"] == 2
+    assert report["failed"] == 4
+    assert [result["status"] for result in report["results"]] == [
+        "created",
+        "created",
+        "duplicate",
+        "duplicate",
+        "invalid",
+        "invalid",
+    ]
+    assert report["results"][5]["username"] == "123"
+
+    login_response = test_client.post(
+        "/auth/login", data={"username": "bob@example.com", "password": "pw2"}
+    )
+    assert login_response.status_code == status.HTTP_200_OK
+
+
+@pytest.mark.admin
+def test_bulk_create_users_from_csv(test_client, admin_token):
+    csv_body = "username,email,password,role\ndave,dave@example.com,pw,\n"
+    response = test_client.post(
+        "/admin/users/bulk",
+        headers={
+            "Authorization": f"Bearer {admin_token}",
+            "Content-Type": "text/csv",
+        },
+        content=csv_body,
+    )
+
+    assert response.status_code == status.HTTP_200_OK, response.json()
+    assert response.json()["results"][0]["status"] == "created"
+    assert response.json()["results"][0]["id"] is not None
+
+
+@pytest.mark.admin
+def test_update_book_copies(test_client, admin_token):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    book = {"title": "Copies", "author": "Author", "isbn": "4444"}
+    book_id = test_client.post("/admin/books", headers=headers, json=book).json()["id"]
+
+    grown = test_client.put(
+        f"/admin/books/{book_id}", headers=headers, json={**book, "copies": 3}
+    )
+    assert grown.status_code == status.HTTP_200_OK
+    assert grown.json()["total_copies"] == grown.json()["available_copies"] == 3
+
+    shrunk = test_client.put(
+        f"/admin/books/{book_id}", headers=headers, json={**book, "copies": 1}
+    )
+    assert shrunk.status_code == status.HTTP_200_OK
+    assert shrunk.json()["total_copies"] == shrunk.json()["available_copies"] == 1
+
+
+def test_hash_passwords_uses_process_pool(monkeypatch):
+    monkeypatch.setattr(security, "PASSWORD_HASH_WORKERS", 2)
+    passwords = [f"password-{i}" for i in range(4)]
+    try:
+        hashed = security.hash_passwords(passwords)
+        assert security._hash_pool is not None
+    finally:
+        security.shutdown_hash_pool()
+    assert security._hash_pool is None
+    assert all(map(security.verify_password, passwords, hashed))
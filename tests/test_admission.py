@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+from fastapi import status
+
+from utils.admission import AdmissionControlMiddleware, RouteClass, classify
+
+
+@pytest.mark.parametrize(
+    "method, path, expected_class",
+    [
+        ("POST", "/auth/login", "auth"),
+        ("POST", "/auth/signup", "auth"),
+        ("GET", "/auth/me", "read"),
+        ("GET", "/books/", "read"),
+        ("POST", "/books/batch", "read"),
+        ("POST", "/books/1/borrow", "write"),
+        ("DELETE", "/admin/books/1", "write"),
+    ],
+)
+def test_classify(method, path, expected_class):
+    assert classify(method, path) == expected_class
+
+
+def test_route_class_sheds_when_queue_full():
+    route_class = RouteClass("auth", limit=1, max_queue=1, queue_timeout=1.0)
+
+    async def scenario():
+        assert await route_class.acquire()
+        queued = asyncio.create_task(route_class.acquire())
+        await asyncio.sleep(0)
+        # One running, one queued: the next caller is shed immediately.
+        assert not await route_class.acquire()
+        route_class.release()
+        assert await queued
+        route_class.release()
+
+    asyncio.run(scenario())
+    stats = route_class.snapshot()
+    assert stats["shed_queue_full"] == 1
+    assert stats["active"] == 0
+    assert stats["queued"] == 0
+
+
+def test_route_class_sheds_on_queue_deadline():
+    route_class = RouteClass("write", limit=1, max_queue=4, queue_timeout=0.01)
+
+    async def scenario():
+        assert await route_class.acquire()
+        assert not await route_class.acquire()
+        route_class.release()
+
+    asyncio.run(scenario())
+    assert route_class.snapshot()["shed_timeout"] == 1
+
+
+def test_middleware_returns_503_with_retry_after():
+    saturated = RouteClass("read", limit=0, max_queue=0, queue_timeout=2.0)
+    route_classes = {"auth": saturated, "write": saturated, "read": saturated}
+
+    async def app(scope, receive, send):
+        raise AssertionError("shed requests must not reach the app")
+
+    middleware = AdmissionControlMiddleware(app, route_classes)
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": "/books/"}
+    asyncio.run(middleware(scope, None, send))
+
+    assert messages[0]["status"] == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert (b"retry-after", b"2") in messages[0]["headers"]
+
+
+def test_admission_metrics(test_client):
+    response = test_client.get("/metrics/admission")
+    assert response.status_code == status.HTTP_200_OK
+    assert set(response.json()) == {"auth", "write", "read"}
@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+
+from sqlmodel import select
+
+from models.book import Book
+from models.borrow import Borrow, BorrowArchive
+from utils.archival import archive_returned_loans, user_history
+
+
+def _seed_loans(test_db, test_member):
+    book = Book(title="Archived Book", author="Author", isbn="1111111111111")
+    test_db.add(book)
+    test_db.commit()
+    test_db.refresh(book)
+
+    now = datetime.utcnow()
+    loans = [
+        # returned long ago: archived
+        Borrow(
+            user_id=test_member.id,
+            book_id=book.id,
+            borrowed_at=now - timedelta(days=400),
+            returned_at=now - timedelta(days=390),
+        ),
+        Borrow(
+            user_id=test_member.id,
+            book_id=book.id,
+            borrowed_at=now - timedelta(days=300),
+            returned_at=now - timedelta(days=290),
+        ),
+        # recently returned and still active: stay hot
+        Borrow(
+            user_id=test_member.id,
+            book_id=book.id,
+            borrowed_at=now - timedelta(days=20),
+            returned_at=now - timedelta(days=10),
+        ),
+        Borrow(user_id=test_member.id, book_id=book.id, borrowed_at=now),
+    ]
+    test_db.add_all(loans)
+    test_db.commit()
+    return now
+
+
+def test_archive_moves_old_returned_loans_in_batches(test_db, test_member):
+    _seed_loans(test_db, test_member)
+
+    # One batch of one row per run, resumed by the next run
+    assert archive_returned_loans(test_db, 180, batch_size=1, max_batches=1) == 1
+    assert archive_returned_loans(test_db, 180, batch_size=1) == 1
+    assert archive_returned_loans(test_db, 180, batch_size=1) == 0
+
+    assert len(test_db.exec(select(Borrow)).all()) == 2
+    assert len(test_db.exec(select(BorrowArchive)).all()) == 2
+
+
+def test_history_unions_archive_only_when_needed(test_db, test_member):
+    now = _seed_loans(test_db, test_member)
+    archive_returned_loans(test_db, 180)
+
+    full_history = user_history(test_db, test_member.id, test_member.branch_id)
+    assert len(full_history) == 4
+    assert full_history == sorted(full_history, key=lambda loan: loan.borrowed_at)
+
+    recent = user_history(
+        test_db, test_member.id, test_member.branch_id, since=now - timedelta(days=30)
+    )
+    assert len(recent) == 2
+    assert all(isinstance(loan, Borrow) for loan in recent)
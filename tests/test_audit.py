@@ -0,0 +1,40 @@
+import json
+
+from sqlmodel import select
+
+from models.audit import AuditLog
+from utils.audit import AuditLogger, DatabaseSink, JsonlSink
+
+
+def test_audit_events_flushed_to_jsonl_on_stop(tmp_path):
+    path = tmp_path / "audit.jsonl"
+    audit_log = AuditLogger(max_queue=100, batch_size=2, flush_interval=60)
+    audit_log.start(JsonlSink(str(path)))
+
+    for book_id in range(5):
+        audit_log.record("book.borrowed", actor_id=1, target=f"book:{book_id}")
+    audit_log.stop()
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line["target"] for line in lines] == [f"book:{i}" for i in range(5)]
+
+
+def test_audit_queue_is_bounded():
+    audit_log = AuditLogger(max_queue=2)
+    for _ in range(5):
+        audit_log.record("auth.login", actor_id=1)
+    assert audit_log.dropped == 3
+
+
+def test_audit_events_written_to_database(test_db):
+    from tests.conftest import engine
+
+    audit_log = AuditLogger(batch_size=10, flush_interval=0.01)
+    audit_log.start(DatabaseSink(engine))
+    audit_log.record("book.created", actor_id=7, target="book:1", isbn="123")
+    audit_log.record("book.deleted", actor_id=7, target="book:1")
+    audit_log.stop()
+
+    rows = test_db.exec(select(AuditLog).order_by(AuditLog.id)).all()
+    assert [row.event for row in rows] == ["book.created", "book.deleted"]
+    assert json.loads(rows[0].details) == {"isbn": "123"}
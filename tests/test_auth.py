@@ -175,3 +175,86 @@ def test_signup_duplicate_email(test_client):
         duplicate_response.status_code == status.HTTP_400_BAD_REQUEST
     ), f"Unexpected response: {duplicate_response.json()}"
     assert duplicate_response.json()["detail"] == "Email already registered"
+
+
+@pytest.mark.auth
+def test_login_rate_limited_before_password_check(test_client, monkeypatch):
+    """Throttled logins are rejected with 429 without any bcrypt work."""
+    from routes import auth
+    from utils import rate_limit
+
+    monkeypatch.setattr(
+        rate_limit, "LOGIN_LIMIT_PER_EMAIL", rate_limit.RateLimit(2, 60)
+    )
+    verify_calls = []
+
+    def counting_verify(plain_password, hashed_password):
+        verify_calls.append(plain_password)
+        return False
+
+    test_client.post(
+        "/auth/signup",
+        json={
+            "username": "victim",
+            "email": "victim@example.com",
+            "password": "secret",
+            "role": "member",
+        },
+    )
+    monkeypatch.setattr(auth, "verify_password", counting_verify)
+
+    statuses = [
+        test_client.post(
+            "/auth/login",
+            data={"username": "victim@example.com", "password": f"guess{i}"},
+        ).status_code
+        for i in range(3)
+    ]
+
+    assert statuses == [
+        status.HTTP_401_UNAUTHORIZED,
+        status.HTTP_401_UNAUTHORIZED,
+        status.HTTP_429_TOO_MANY_REQUESTS,
+    ]
+    assert len(verify_calls) == 2
+
+
+@pytest.mark.auth
+def test_token_bucket_refills(monkeypatch):
+    from utils import rate_limit
+
+    clock = [1000.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: clock[0])
+    backend = rate_limit.InMemoryBackend()
+    limit = rate_limit.RateLimit(2, 10)
+
+    assert backend.consume("k", limit) == 0
+    assert backend.consume("k", limit) == 0
+    assert backend.consume("k", limit) == pytest.approx(5.0)
+
+    clock[0] += 5
+    assert backend.consume("k", limit) == 0
+
+
+@pytest.mark.auth
+def test_redis_token_bucket_refills(monkeypatch):
+    """The Lua bucket on Redis matches InMemoryBackend (fakeredis runs the script)."""
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    from utils import rate_limit
+
+    clock = [1000.0]
+    monkeypatch.setattr(rate_limit.time, "time", lambda: clock[0])
+    client = fakeredis.FakeRedis()
+    backend = rate_limit.RedisBackend(None, client=client)
+    limit = rate_limit.RateLimit(2, 10)
+
+    assert backend.consume("k", limit) == 0
+    assert backend.consume("k", limit) == 0
+    assert backend.consume("k", limit) == pytest.approx(5.0)
+    # Idle buckets expire once they would have refilled completely
+    assert client.ttl("ratelimit:k") == 11
+
+    clock[0] += 5
+    assert backend.consume("k", limit) == 0
+
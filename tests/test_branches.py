@@ -0,0 +1,146 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException, status
+from sqlmodel import Session, SQLModel, create_engine
+
+import database
+
+from database import engine, engine_for_branch
+from models.book import Book
+from models.hold import Hold, HoldStatus
+from models.user import User
+from utils import holds
+from utils.branches import DEFAULT_BRANCH_ID, parse_branch_urls, resolve_branch
+from utils.security import create_access_token, verify_token
+
+
+def _signup_and_login(test_client, name, role, branch_id):
+    headers = {"X-Branch-Id": str(branch_id)}
+    test_client.post(
+        "/auth/signup",
+        headers=headers,
+        json={
+            "username": name,
+            "email": f"{name}@example.com",
+            "password": "password",
+            "role": role,
+        },
+    )
+    response = test_client.post(
+        "/auth/login",
+        headers=headers,
+        data={"username": f"{name}@example.com", "password": "password"},
+    )
+    return response.json()["access_token"]
+
+
+def _add_book(test_client, token, isbn):
+    response = test_client.post(
+        "/admin/books",
+        headers={"Authorization": f"Bearer {token}"},
+        json={"title": "Dune", "author": "Herbert", "isbn": isbn},
+    )
+    assert response.status_code == status.HTTP_201_CREATED, response.json()
+    return response.json()["id"]
+
+
+def test_resolve_branch_prefers_token_claim():
+    token = create_access_token({"sub": "1", "role": "member", "branch": 3})
+    assert resolve_branch(f"Bearer {token}", "7") == 3
+    assert resolve_branch(None, "7") == 7
+    assert resolve_branch(None, None) == DEFAULT_BRANCH_ID
+    with pytest.raises(HTTPException):
+        resolve_branch(None, "north")
+
+
+def test_branch_database_urls():
+    assert parse_branch_urls("2=sqlite:///b2.db; 3=sqlite:///b3.db") == {
+        2: "sqlite:///b2.db",
+        3: "sqlite:///b3.db",
+    }
+    assert parse_branch_urls("") == {}
+    # Branches without their own URL share the primary database
+    assert engine_for_branch(99) is engine
+
+
+def test_login_token_carries_branch(test_client):
+    token = _signup_and_login(test_client, "north_admin", "admin", 2)
+    assert verify_token(token)["branch"] == 2
+
+
+def test_catalog_is_scoped_to_branch(test_client, admin_token):
+    north_token = _signup_and_login(test_client, "north_admin", "admin", 2)
+    north_book = _add_book(test_client, north_token, "111")
+    # The same ISBN may be stocked by several branches
+    main_book = _add_book(test_client, admin_token, "111")
+
+    main_catalog = test_client.get("/books/").json()
+    assert [book["id"] for book in main_catalog] == [main_book]
+    north_catalog = test_client.get("/books/", headers={"X-Branch-Id": "2"}).json()
+    assert [book["id"] for book in north_catalog] == [north_book]
+
+    response = test_client.get(
+        f"/admin/books/{north_book}", headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_member_cannot_borrow_from_another_branch(test_client):
+    north_token = _signup_and_login(test_client, "north_admin", "admin", 2)
+    north_book = _add_book(test_client, north_token, "222")
+    member_token = _signup_and_login(test_client, "reader", "member", 1)
+
+    response = test_client.post(
+        f"/books/{north_book}/borrow",
+        headers={"Authorization": f"Bearer {member_token}", "X-Branch-Id": "2"},
+    )
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    # A token without a branch claim cannot switch branches via the header
+    legacy_token = create_access_token(
+        {"sub": verify_token(member_token)["sub"], "role": "member"}
+    )
+    response = test_client.post(
+        f"/books/{north_book}/borrow",
+        headers={"Authorization": f"Bearer {legacy_token}", "X-Branch-Id": "2"},
+    )
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+def test_return_does_not_reveal_other_branch_books(test_client):
+    north_token = _signup_and_login(test_client, "north_admin", "admin", 2)
+    north_book = _add_book(test_client, north_token, "333")
+    member_token = _signup_and_login(test_client, "reader", "member", 1)
+
+    response = test_client.post(
+        f"/books/{north_book}/return",
+        headers={"Authorization": f"Bearer {member_token}"},
+    )
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_maintenance_cli_covers_every_branch_database(tmp_path, monkeypatch, capsys):
+    engines = [create_engine(f"sqlite:///{tmp_path / f'branch{i}.db'}") for i in (1, 2)]
+    for engine in engines:
+        SQLModel.metadata.create_all(engine)
+        with Session(engine) as db:
+            user = User(username="u", email="u@example.com", hashed_password="x")
+            book = Book(title="T", author="A", isbn="1", available_copies=0)
+            db.add_all([user, book])
+            db.flush()
+            db.add(
+                Hold(
+                    user_id=user.id,
+                    book_id=book.id,
+                    status=HoldStatus.ready,
+                    expires_at=datetime.utcnow() - timedelta(hours=1),
+                )
+            )
+            db.commit()
+    monkeypatch.setattr(database, "all_engines", lambda: engines)
+    monkeypatch.setattr("sys.argv", ["holds"])
+
+    holds.main()
+
+    assert capsys.readouterr().out.strip() == "Expired 2 holds"
@@ -0,0 +1,107 @@
+import asyncio
+import gzip
+
+from utils.compression import (
+    CompressedBodyCache,
+    CompressionMiddleware,
+    GzipEncoder,
+    negotiate,
+)
+
+
+def _json_app(chunks, headers=None):
+    async def app(scope, receive, send):
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": headers or [(b"content-type", b"application/json")],
+            }
+        )
+        for index, chunk in enumerate(chunks):
+            await send(
+                {
+                    "type": "http.response.body",
+                    "body": chunk,
+                    "more_body": index < len(chunks) - 1,
+                }
+            )
+
+    return app
+
+
+def _call(middleware, accept_encoding=b"gzip"):
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/books/",
+        "headers": [(b"accept-encoding", accept_encoding)],
+    }
+    asyncio.run(middleware(scope, None, send))
+    headers = dict(messages[0]["headers"])
+    body = b"".join(m.get("body", b"") for m in messages[1:])
+    return headers, body
+
+
+def test_negotiate_honours_quality_values():
+    assert negotiate("gzip, deflate") is GzipEncoder
+    assert negotiate("gzip;q=0, identity") is None
+    assert negotiate("*") is not None
+    assert negotiate("") is None
+
+
+def test_large_json_is_gzipped_and_cached():
+    body = b'{"title": "Dune"}' * 200
+    cache = CompressedBodyCache(max_bytes=1024 * 1024)
+    middleware = CompressionMiddleware(_json_app([body]), minimum_size=1024, cache=cache)
+
+    headers, compressed = _call(middleware)
+    assert headers[b"content-encoding"] == b"gzip"
+    assert headers[b"vary"] == b"Accept-Encoding"
+    assert int(headers[b"content-length"]) == len(compressed)
+    assert gzip.decompress(compressed) == body
+
+    # The same payload is served from the cache without recompressing.
+    _call(middleware)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_small_or_already_encoded_bodies_pass_through():
+    small = CompressionMiddleware(_json_app([b"{}"]), minimum_size=1024)
+    headers, body = _call(small)
+    assert b"content-encoding" not in headers
+    assert body == b"{}"
+
+    encoded = CompressionMiddleware(
+        _json_app(
+            [b"x" * 4096],
+            headers=[
+                (b"content-type", b"application/json"),
+                (b"content-encoding", b"br"),
+            ],
+        ),
+        minimum_size=1024,
+    )
+    headers, body = _call(encoded)
+    assert headers[b"content-encoding"] == b"br"
+    assert body == b"x" * 4096
+
+
+def test_streamed_response_is_compressed_per_chunk():
+    chunks = [b'{"id": %d}\n' % i for i in range(500)]
+    middleware = CompressionMiddleware(_json_app(chunks), minimum_size=1024)
+
+    headers, compressed = _call(middleware)
+    assert headers[b"content-encoding"] == b"gzip"
+    assert b"content-length" not in headers
+    assert gzip.decompress(compressed) == b"".join(chunks)
+
+
+def test_identity_client_gets_plain_body(test_client):
+    response = test_client.get("/", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
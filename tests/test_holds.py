@@ -0,0 +1,110 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy.sql import Select
+
+from models.book import Book, BookCopy
+from models.hold import Hold, HoldStatus
+from utils.holds import claim_ready_hold, expire_holds
+from utils.inventory import add_copies, checkout_copy
+
+
+def test_expired_hold_returns_copy_to_shelf(test_db, test_member):
+    book = Book(
+        title="Held", author="Author", isbn="7777", total_copies=0, available_copies=0
+    )
+    test_db.add(book)
+    test_db.flush()
+    add_copies(test_db, book, 1)
+    _, copy_id = checkout_copy(test_db, book.id)
+    hold = Hold(
+        user_id=test_member.id,
+        book_id=book.id,
+        copy_id=copy_id,
+        status=HoldStatus.ready,
+        expires_at=datetime.utcnow() - timedelta(hours=1),
+    )
+    test_db.add(hold)
+    test_db.commit()
+
+    assert expire_holds(test_db) == 1
+
+    test_db.refresh(hold)
+    test_db.refresh(book)
+    assert hold.status == HoldStatus.expired
+    assert book.available_copies == 1
+    assert expire_holds(test_db) == 0
+
+
+class _Rows:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+
+def test_borrow_racing_expiry_keeps_copy_lent(test_db, test_member, monkeypatch):
+    book = Book(
+        title="Held", author="Author", isbn="7778", total_copies=0, available_copies=0
+    )
+    test_db.add(book)
+    test_db.flush()
+    add_copies(test_db, book, 1)
+    _, copy_id = checkout_copy(test_db, book.id)
+    hold = Hold(
+        user_id=test_member.id,
+        book_id=book.id,
+        copy_id=copy_id,
+        status=HoldStatus.ready,
+        expires_at=datetime.utcnow() + timedelta(hours=1),
+    )
+    test_db.add(hold)
+    test_db.commit()
+
+    exec_ = test_db.exec
+    raced = []  # result of the borrow that runs mid-sweep
+
+    def borrow_after_sweep_reads(statement, *args, **kwargs):
+        result = exec_(statement, *args, **kwargs)
+        if isinstance(statement, Select):
+            # The sweep has its batch; the holder borrows before it writes
+            rows = result.all()
+            monkeypatch.setattr(test_db, "exec", exec_)
+            raced.append(claim_ready_hold(test_db, test_member.id, book.id))
+            test_db.commit()
+            return _Rows(rows)
+        return result
+
+    monkeypatch.setattr(test_db, "exec", borrow_after_sweep_reads)
+    swept = expire_holds(test_db, now=datetime.utcnow() + timedelta(hours=2))
+    monkeypatch.undo()
+
+    assert raced[0] is not None  # the borrow claimed the copy
+    assert swept == 0
+    test_db.expire_all()
+    assert test_db.get(Hold, hold.id).status == HoldStatus.fulfilled
+    assert test_db.get(Book, book.id).available_copies == 0
+    assert test_db.get(BookCopy, copy_id).available is False
+
+
+def test_expired_hold_cannot_be_claimed(test_db, test_member):
+    book = Book(
+        title="Held", author="Author", isbn="7779", total_copies=0, available_copies=0
+    )
+    test_db.add(book)
+    test_db.flush()
+    add_copies(test_db, book, 1)
+    _, copy_id = checkout_copy(test_db, book.id)
+    test_db.add(
+        Hold(
+            user_id=test_member.id,
+            book_id=book.id,
+            copy_id=copy_id,
+            status=HoldStatus.ready,
+            expires_at=datetime.utcnow() - timedelta(minutes=1),
+        )
+    )
+    test_db.commit()
+
+    assert claim_ready_hold(test_db, test_member.id, book.id) is None
+    assert expire_holds(test_db) == 1
@@ -0,0 +1,193 @@
+import asyncio
+
+from utils.idempotency import (
+    IdempotencyMiddleware,
+    IdempotencyStore,
+    RedisIdempotencyStore,
+)
+
+
+def _scope(key=b"abc"):
+    return {
+        "type": "http",
+        "method": "POST",
+        "path": "/books/1/borrow",
+        "headers": [(b"authorization", b"Bearer t"), (b"idempotency-key", key)],
+    }
+
+
+def _receive(body=b""):
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    return receive
+
+
+class FakeAsyncRedis:
+    """The few redis.asyncio commands the idempotency store uses."""
+
+    def __init__(self):
+        self.data = {}
+        self.ttls = {}
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value.encode() if isinstance(value, str) else value
+        self.ttls[key] = ex
+        return True
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def delete(self, key):
+        self.data.pop(key, None)
+        self.ttls.pop(key, None)
+
+    async def scan_iter(self, pattern):
+        for key in list(self.data):
+            if key.startswith(pattern.rstrip("*")):
+                yield key
+
+
+def _slow_app(calls):
+    async def app(scope, receive, send):
+        calls.append(scope["path"])
+        await asyncio.sleep(0.05)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b'{"id":1}'})
+
+    return app
+
+
+def test_concurrent_duplicates_are_coalesced():
+    calls = []
+    middleware = IdempotencyMiddleware(_slow_app(calls), IdempotencyStore(10, 60))
+    responses = [[], []]
+
+    def collector(messages):
+        async def send(message):
+            messages.append(message)
+
+        return send
+
+    async def scenario():
+        await asyncio.gather(
+            middleware(_scope(), _receive(), collector(responses[0])),
+            middleware(_scope(), _receive(), collector(responses[1])),
+        )
+
+    asyncio.run(scenario())
+
+    assert len(calls) == 1
+    assert responses[0][1]["body"] == responses[1][1]["body"] == b'{"id":1}'
+
+
+def test_failed_requests_are_not_stored():
+    calls = []
+
+    async def failing_app(scope, receive, send):
+        calls.append(scope["path"])
+        await send({"type": "http.response.start", "status": 500, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    middleware = IdempotencyMiddleware(failing_app, IdempotencyStore(10, 60))
+
+    async def send(message):
+        pass
+
+    asyncio.run(middleware(_scope(), _receive(), send))
+    asyncio.run(middleware(_scope(), _receive(), send))
+
+    assert len(calls) == 2
+
+
+def test_store_is_bounded():
+    store = IdempotencyStore(max_keys=2, ttl_seconds=60)
+
+    async def scenario():
+        for key in ("a", "b", "c"):
+            entry, owner = await store.begin(key)
+            assert owner
+            await store.complete(entry, (200, [], b""))
+
+        # "a" was least recently used and has been evicted.
+        assert (await store.begin("a"))[1]
+        assert not (await store.begin("c"))[1]
+
+    asyncio.run(scenario())
+
+
+def test_reused_key_with_different_body_is_rejected():
+    calls = []
+    middleware = IdempotencyMiddleware(_slow_app(calls), IdempotencyStore(10, 60))
+    responses = [[], [], []]
+
+    def collector(messages):
+        async def send(message):
+            messages.append(message)
+
+        return send
+
+    asyncio.run(middleware(_scope(), _receive(b'{"copies": 1}'), collector(responses[0])))
+    asyncio.run(middleware(_scope(), _receive(b'{"copies": 1}'), collector(responses[1])))
+    asyncio.run(middleware(_scope(), _receive(b'{"copies": 5}'), collector(responses[2])))
+
+    assert len(calls) == 1
+    assert (b"idempotent-replayed", b"true") in responses[1][0]["headers"]
+    assert responses[2][0]["status"] == 422
+
+
+def test_redis_store_shares_responses_between_workers():
+    client = FakeAsyncRedis()
+    # Two workers, each with its own store on the same Redis
+    stores = [
+        RedisIdempotencyStore(
+            None, ttl_seconds=60, pending_ttl=30, poll_interval=0.01, client=client
+        )
+        for _ in range(2)
+    ]
+    calls = []
+    workers = [IdempotencyMiddleware(_slow_app(calls), store) for store in stores]
+    responses = [[], [], []]
+
+    def collector(messages):
+        async def send(message):
+            messages.append(message)
+
+        return send
+
+    async def scenario():
+        # The second worker's duplicate waits on the pending key
+        await asyncio.gather(
+            workers[0](_scope(), _receive(b"{}"), collector(responses[0])),
+            workers[1](_scope(), _receive(b"{}"), collector(responses[1])),
+        )
+        await workers[1](_scope(), _receive(b"{}"), collector(responses[2]))
+
+    asyncio.run(scenario())
+
+    assert len(calls) == 1
+    assert [messages[1]["body"] for messages in responses] == [b'{"id":1}'] * 3
+    assert (b"idempotent-replayed", b"true") in responses[2][0]["headers"]
+    (key,) = client.data
+    assert client.ttls[key] == 60
+
+
+def test_redis_store_abandons_failed_requests():
+    client = FakeAsyncRedis()
+    store = RedisIdempotencyStore(None, ttl_seconds=60, pending_ttl=30, client=client)
+
+    async def scenario():
+        entry, owner = await store.begin("k", "digest")
+        assert owner
+        # Pending: a duplicate sees the owner's entry without a response
+        duplicate, owner = await store.begin("k", "digest")
+        assert not owner and duplicate.response is None
+        assert client.ttls["idempotency:k"] == 30
+
+        await store.abandon("k", entry)
+        assert client.data == {}
+        assert (await store.begin("k", "digest"))[1]
+
+    asyncio.run(scenario())
@@ -0,0 +1,153 @@
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import Select, Update, update
+from sqlmodel import select
+
+from models.book import Book
+from models.borrow import Borrow
+from utils import notifications
+from utils.overdue import compute_fine, sweep_overdue
+from utils.scheduler import Scheduler
+
+
+def test_compute_fine():
+    due = datetime(2025, 1, 1)
+    assert compute_fine(due, due) == 0
+    assert compute_fine(None, due) == 0
+    assert compute_fine(due, due + timedelta(days=2, hours=1)) == 3 * 25
+    assert compute_fine(due, due + timedelta(days=365)) == 2000
+
+
+def test_sweep_overdue_pages_through_loans(test_db, test_member, monkeypatch):
+    sink = notifications.MemorySink()
+    monkeypatch.setattr(notifications, "sink", sink)
+
+    book = Book(title="Late", author="Author", isbn="8888")
+    test_db.add(book)
+    test_db.commit()
+    now = datetime.utcnow()
+    test_db.add_all(
+        [
+            Borrow(
+                user_id=test_member.id,
+                book_id=book.id,
+                due_at=now - timedelta(days=days),
+            )
+            for days in (1, 3, 3, 5)
+        ]
+        + [
+            # not yet due, and returned late: both ignored
+            Borrow(
+                user_id=test_member.id,
+                book_id=book.id,
+                due_at=now + timedelta(days=1),
+            ),
+            Borrow(
+                user_id=test_member.id,
+                book_id=book.id,
+                due_at=now - timedelta(days=9),
+                returned_at=now,
+            ),
+        ]
+    )
+    test_db.commit()
+
+    assert sweep_overdue(test_db, now=now, batch_size=2, pause=0) == 4
+    assert len(sink.sent) == 4
+    fines = sorted(loan.fine_cents for loan in test_db.exec(select(Borrow)))
+    assert fines == [0, 0, 50, 100, 100, 150]
+
+    # Already notified today: fines are kept, no duplicate reminders
+    assert sweep_overdue(test_db, now=now, pause=0) == 4
+    assert len(sink.sent) == 4
+
+
+def test_sweep_keeps_fine_of_loan_returned_mid_batch(test_db, test_member, monkeypatch):
+    monkeypatch.setattr(notifications, "sink", notifications.MemorySink())
+    book = Book(title="Late", author="Author", isbn="8889")
+    test_db.add(book)
+    test_db.commit()
+    now = datetime.utcnow()
+    loan = Borrow(user_id=test_member.id, book_id=book.id, due_at=now - timedelta(days=3))
+    test_db.add(loan)
+    test_db.commit()
+    loan_id = loan.id
+
+    exec_ = test_db.exec
+
+    def return_before_update(statement, *args, **kwargs):
+        if isinstance(statement, Update):
+            # return_book commits between the sweep's SELECT and its UPDATE
+            exec_(
+                update(Borrow)
+                .where(Borrow.id == loan_id)
+                .values(returned_at=now, fine_cents=999)
+            )
+        return exec_(statement, *args, **kwargs)
+
+    monkeypatch.setattr(test_db, "exec", return_before_update)
+    sweep_overdue(test_db, now=now, pause=0)
+    monkeypatch.undo()
+
+    test_db.expire_all()
+    assert test_db.get(Borrow, loan_id).fine_cents == 999
+
+
+class _Rows:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+
+def test_concurrent_sweeps_send_each_reminder_once(test_db, test_member, monkeypatch):
+    sink = notifications.MemorySink()
+    monkeypatch.setattr(notifications, "sink", sink)
+    book = Book(title="Late", author="Author", isbn="8890")
+    test_db.add(book)
+    test_db.commit()
+    now = datetime.utcnow()
+    test_db.add_all(
+        Borrow(user_id=test_member.id, book_id=book.id, due_at=now - timedelta(days=2))
+        for _ in range(3)
+    )
+    test_db.commit()
+
+    exec_ = test_db.exec
+
+    def other_sweep_after_select(statement, *args, **kwargs):
+        result = exec_(statement, *args, **kwargs)
+        if isinstance(statement, Select):
+            # Another host's sweep runs to completion between our read and writes
+            rows = result.all()
+            monkeypatch.setattr(test_db, "exec", exec_)
+            sweep_overdue(test_db, now=now, pause=0)
+            return _Rows(rows)
+        return result
+
+    monkeypatch.setattr(test_db, "exec", other_sweep_after_select)
+    sweep_overdue(test_db, now=now, pause=0)
+
+    assert sorted(message["borrow_id"] for message in sink.sent) == sorted(
+        test_db.exec(select(Borrow.id)).all()
+    )
+
+
+def test_scheduler_runs_jobs_until_stopped():
+    calls = []
+    scheduler = Scheduler()
+    scheduler.add_job("tick", 0.01, calls.append)
+
+    class FakeEngine:
+        pass
+
+    scheduler.start(FakeEngine())
+    time.sleep(0.1)
+    scheduler.stop()
+
+    count = len(calls)
+    assert count >= 2
+    time.sleep(0.05)
+    assert len(calls) == count
@@ -0,0 +1,65 @@
+from fastapi import status
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from utils import profiling
+
+
+def _auth(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_admin_request_is_profiled(test_client, admin_token):
+    profiling.store.reset()
+    response = test_client.get(
+        "/books/", headers={**_auth(admin_token), "X-Profile": "1"}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    profile_id = response.headers["x-profile-id"]
+
+    report = test_client.get(f"/admin/profiles/{profile_id}", headers=_auth(admin_token))
+    assert report.status_code == status.HTTP_200_OK
+    report = report.json()
+    assert report["path"] == "/books/"
+    assert report["status"] == status.HTTP_200_OK
+    assert any("FROM book" in query["statement"] for query in report["sql"])
+    assert any("browse_books" in row["function"] for row in report["functions"])
+
+    listing = test_client.get("/admin/profiles", headers=_auth(admin_token)).json()
+    assert [entry["id"] for entry in listing] == [profile_id]
+    # Listeners are only attached while a profile is running.
+    assert not event.contains(
+        Engine, "before_cursor_execute", profiling._before_cursor_execute
+    )
+
+
+def test_profile_header_requires_admin(test_client, test_member):
+    from utils.security import create_access_token
+
+    token = create_access_token({"sub": str(test_member.id), "role": "member"})
+    response = test_client.get("/books/", headers={**_auth(token), "X-Profile": "1"})
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+    assert "x-profile-id" not in response.headers
+
+    response = test_client.get("/books/", headers={"X-Profile": "1"})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_profiling_is_skipped_when_slots_are_busy(test_client, admin_token, monkeypatch):
+    monkeypatch.setattr(profiling, "_slots", profiling.threading.BoundedSemaphore(1))
+    profiling._slots.acquire()
+    try:
+        response = test_client.get(
+            "/books/", headers={**_auth(admin_token), "X-Profile": "1"}
+        )
+    finally:
+        profiling._slots.release()
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["x-profile-skipped"] == "busy"
+    assert "x-profile-id" not in response.headers
+
+
+def test_unknown_profile_returns_404(test_client, admin_token):
+    response = test_client.get("/admin/profiles/missing", headers=_auth(admin_token))
+    assert response.status_code == status.HTTP_404_NOT_FOUND
@@ -0,0 +1,157 @@
+import pytest
+from fastapi import status
+from sqlmodel import select
+
+from models.book import Book
+from models.borrow import Borrow, BorrowArchive
+from models.recommendation import BookNeighbour, RecommendationState
+from models.user import User
+
+pytest.importorskip("scipy")
+
+from utils import recommendations  # noqa: E402
+from utils.recommendations import build_related_books  # noqa: E402
+
+
+def _seed(test_db, loans):
+    """Create readers and books, then one loan per (reader, book) pair."""
+    readers = {}
+    books = {}
+    for reader, title in loans:
+        if reader not in readers:
+            readers[reader] = User(
+                username=reader,
+                email=f"{reader}@example.com",
+                hashed_password="x",
+                role="member",
+            )
+            test_db.add(readers[reader])
+        if title not in books:
+            books[title] = Book(title=title, author="Author", isbn=str(len(books) + 1))
+            test_db.add(books[title])
+    test_db.commit()
+    for reader, title in loans:
+        test_db.add(Borrow(user_id=readers[reader].id, book_id=books[title].id))
+    test_db.commit()
+    return readers, {title: book.id for title, book in books.items()}
+
+
+def _neighbours(test_db, book_id):
+    return test_db.exec(
+        select(BookNeighbour.neighbour_id)
+        .where(BookNeighbour.book_id == book_id)
+        .order_by(BookNeighbour.rank)
+    ).all()
+
+
+def test_build_ranks_co_borrowed_books(test_db):
+    _, books = _seed(
+        test_db,
+        [
+            ("ann", "Dune"), ("ann", "Hyperion"), ("ann", "Emma"),
+            ("bob", "Dune"), ("bob", "Hyperion"),
+            ("cat", "Dune"), ("cat", "Emma"),
+            ("dan", "Emma"), ("dan", "Persuasion"),
+        ],
+    )  # fmt: skip
+
+    updated = build_related_books(test_db, min_support=1)
+    assert updated == 4
+    # Hyperion's readers all read Dune; Emma is shared with only one of them.
+    assert _neighbours(test_db, books["Hyperion"]) == [books["Dune"], books["Emma"]]
+    assert _neighbours(test_db, books["Persuasion"]) == [books["Emma"]]
+
+    updated = build_related_books(test_db, min_support=2)
+    assert updated == 0  # nothing borrowed since the last run
+
+    build_related_books(test_db, full=True, min_support=2)
+    assert _neighbours(test_db, books["Dune"]) == [books["Hyperion"], books["Emma"]]
+    assert _neighbours(test_db, books["Persuasion"]) == []
+
+
+def test_incremental_refresh_only_touches_new_readers(test_db):
+    readers, books = _seed(
+        test_db,
+        [("ann", "Dune"), ("ann", "Emma"), ("bob", "Hyperion"), ("bob", "Ulysses")],
+    )
+    build_related_books(test_db, min_support=1)
+    assert _neighbours(test_db, books["Dune"]) == [books["Emma"]]
+
+    # Archived loans still count towards co-borrowing
+    test_db.add(
+        BorrowArchive(
+            id=10_000,
+            user_id=readers["bob"].id,
+            book_id=books["Dune"],
+            borrowed_at=test_db.get(Borrow, 1).borrowed_at,
+            returned_at=test_db.get(Borrow, 1).borrowed_at,
+        )
+    )
+    test_db.add(Borrow(user_id=readers["bob"].id, book_id=books["Emma"]))
+    test_db.commit()
+
+    updated = build_related_books(test_db, min_support=1)
+    assert updated == 4  # every book bob has read
+    assert set(_neighbours(test_db, books["Emma"])) == {
+        books["Dune"],
+        books["Hyperion"],
+        books["Ulysses"],
+    }
+    state = test_db.get(RecommendationState, 1)
+    assert state.last_borrow_id == max(test_db.exec(select(Borrow.id)).all())
+
+
+def test_incremental_refresh_reads_only_affected_readers(test_db, monkeypatch):
+    readers, books = _seed(
+        test_db,
+        [
+            ("ann", "Dune"), ("ann", "Emma"),
+            ("bob", "Dune"), ("bob", "Hyperion"),
+            ("cat", "Ulysses"), ("cat", "Walden"),
+        ],
+    )  # fmt: skip
+    build_related_books(test_db, min_support=1)
+
+    loaded = []
+    load_pairs = recommendations._load_pairs
+
+    def recording_load_pairs(db, column=None, ids=None):
+        pairs = load_pairs(db, column, ids)
+        loaded.append((column, {int(user_id) for user_id in pairs[:, 0]}))
+        return pairs
+
+    monkeypatch.setattr(recommendations, "_load_pairs", recording_load_pairs)
+    test_db.add(Borrow(user_id=readers["ann"].id, book_id=books["Hyperion"]))
+    test_db.commit()
+    assert build_related_books(test_db, min_support=1) == 3
+
+    # Never the whole ledger, and never cat, who shares no book with ann
+    assert all(column is not None for column, _ in loaded)
+    assert all(readers["cat"].id not in users for _, users in loaded)
+
+    incremental = test_db.exec(
+        select(BookNeighbour.book_id, BookNeighbour.neighbour_id, BookNeighbour.score)
+        .order_by(BookNeighbour.book_id, BookNeighbour.rank)
+    ).all()
+    monkeypatch.undo()
+    build_related_books(test_db, full=True, min_support=1)
+    rebuilt = test_db.exec(
+        select(BookNeighbour.book_id, BookNeighbour.neighbour_id, BookNeighbour.score)
+        .order_by(BookNeighbour.book_id, BookNeighbour.rank)
+    ).all()
+    assert incremental == rebuilt
+
+
+def test_related_books_route(test_client, test_db):
+    _, books = _seed(
+        test_db, [("ann", "Dune"), ("ann", "Emma"), ("bob", "Dune"), ("bob", "Emma")]
+    )
+    build_related_books(test_db, min_support=1)
+
+    response = test_client.get(f"/books/{books['Dune']}/related")
+    assert response.status_code == status.HTTP_200_OK
+    related = response.json()
+    assert [book["id"] for book in related] == [books["Emma"]]
+    assert related[0]["score"] == pytest.approx(1.0)
+
+    assert test_client.get("/books/9999/related").status_code == status.HTTP_404_NOT_FOUND
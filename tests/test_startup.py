@@ -0,0 +1,84 @@
+import pytest
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.runtime.migration import MigrationContext
+from sqlalchemy import text
+from sqlmodel import SQLModel, create_engine
+
+from database import alembic_config, check_schema_revision
+
+
+@pytest.fixture
+def empty_engine(tmp_path):
+    return create_engine(f"sqlite:///{tmp_path / 'startup.db'}")
+
+
+def _upgrade(engine, revision="head"):
+    config = alembic_config()
+    config.attributes["configure_logger"] = False
+    with engine.begin() as connection:
+        config.attributes["connection"] = connection
+        command.upgrade(config, revision)
+
+
+def test_schema_check_fails_before_migrations(empty_engine):
+    with pytest.raises(RuntimeError, match="alembic upgrade head"):
+        check_schema_revision(empty_engine)
+
+
+def test_schema_check_passes_at_head(empty_engine):
+    _upgrade(empty_engine)
+    check_schema_revision(empty_engine)
+
+
+def test_migrations_match_models(empty_engine):
+    """Every model change needs a migration for the startup check to be safe."""
+    _upgrade(empty_engine)
+    with empty_engine.connect() as connection:
+        context = MigrationContext.configure(connection)
+        diff = compare_metadata(context, SQLModel.metadata)
+    assert diff == []
+
+
+def test_upgrade_converts_baseline_data(empty_engine):
+    _upgrade(empty_engine, "0001")
+    with empty_engine.begin() as connection:
+        connection.execute(
+            text(
+                "INSERT INTO user (id, username, email, hashed_password, role) "
+                "VALUES (1, 'reader', 'reader@example.com', 'x', 'member')"
+            )
+        )
+        connection.execute(
+            text(
+                "INSERT INTO book (id, title, author, isbn, available) VALUES "
+                "(1, 'Dune', 'Herbert', '1', 1), (2, 'Emma', 'Austen', '2', 0)"
+            )
+        )
+        connection.execute(
+            text(
+                "INSERT INTO borrow (id, user_id, book_id, borrowed_at, returned_at) "
+                "VALUES (1, 1, 2, '2026-01-01 10:00:00', NULL), "
+                "(2, 1, 1, '2025-12-01 10:00:00', '2025-12-10 10:00:00')"
+            )
+        )
+
+    _upgrade(empty_engine)
+    with empty_engine.connect() as connection:
+        books = connection.execute(
+            text("SELECT id, total_copies, available_copies FROM book ORDER BY id")
+        ).all()
+        copies = connection.execute(
+            text("SELECT id, book_id, available FROM bookcopy ORDER BY book_id")
+        ).all()
+        loans = dict(connection.execute(text("SELECT id, copy_id FROM borrow")).all())
+        due = dict(connection.execute(text("SELECT id, due_at FROM borrow")).all())
+    assert books == [(1, 1, 1), (2, 1, 0)]
+    assert [(book_id, bool(available)) for _, book_id, available in copies] == [
+        (1, True),
+        (2, False),
+    ]
+    assert loans == {1: copies[1][0], 2: None}
+    # Only the open loan needs a due date for the overdue sweep
+    assert str(due[1]).startswith("2026-01-15 10:00:00")
+    assert due[2] is None
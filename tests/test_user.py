@@ -1,6 +1,9 @@
 import pytest
 from fastapi import status
 
+from models.hold import Hold
+from utils.security import verify_token
+
 
 @pytest.fixture
 def member_token(test_client):
@@ -165,3 +168,191 @@ def test_return_nonexistent_book(test_client, member_token):
 
     assert response.status_code == status.HTTP_404_NOT_FOUND
     assert response.json()["detail"] == "Book not found"
+
+
+@pytest.mark.user
+def test_borrow_retry_with_idempotency_key(test_client, member_token, create_test_book):
+    """A retried borrow with the same Idempotency-Key replays the first result."""
+    book_id = create_test_book
+    headers = {
+        "Authorization": f"Bearer {member_token}",
+        "Idempotency-Key": "borrow-retry-1",
+    }
+
+    first = test_client.post(f"/books/{book_id}/borrow", headers=headers)
+    retry = test_client.post(f"/books/{book_id}/borrow", headers=headers)
+
+    assert first.status_code == status.HTTP_200_OK, first.json()
+    assert retry.status_code == status.HTTP_200_OK, retry.json()
+    assert retry.json() == first.json()
+    assert retry.headers["idempotent-replayed"] == "true"
+
+    # Without the key the duplicate still fails as before.
+    duplicate = test_client.post(
+        f"/books/{book_id}/borrow", headers={"Authorization": f"Bearer {member_token}"}
+    )
+    assert duplicate.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.user
+def test_books_batch_lookup(test_client, admin_token, create_test_book):
+    """Batch lookup keeps request order and reports missing ids."""
+    second = test_client.post(
+        "/admin/books",
+        headers={"Authorization": f"Bearer {admin_token}"},
+        json={"title": "Second Book", "author": "Author", "isbn": "1234567891235"},
+    ).json()["id"]
+
+    response = test_client.get(f"/books/batch?ids={second},999,{create_test_book}")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert [book["id"] for book in response.json()["books"]] == [
+        second,
+        create_test_book,
+    ]
+    assert response.json()["missing"] == [999]
+
+    body_response = test_client.post(
+        "/books/batch", json={"ids": [create_test_book, second]}
+    )
+    assert body_response.status_code == status.HTTP_200_OK
+    assert [book["id"] for book in body_response.json()["books"]] == [
+        create_test_book,
+        second,
+    ]
+
+
+@pytest.mark.user
+@pytest.mark.parametrize("ids", ["", "1,abc", ",".join(["1"] * 501)])
+def test_books_batch_invalid_ids(test_client, ids):
+    response = test_client.get(f"/books/batch?ids={ids}")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.user
+def test_borrow_counts_copies(test_client, admin_token, member_token):
+    """A title with two copies can be borrowed twice, then is unavailable."""
+    book_id = test_client.post(
+        "/admin/books",
+        headers={"Authorization": f"Bearer {admin_token}"},
+        json={"title": "Popular", "author": "Author", "isbn": "5555", "copies": 2},
+    ).json()["id"]
+    headers = {"Authorization": f"Bearer {member_token}"}
+
+    first = test_client.post(f"/books/{book_id}/borrow", headers=headers)
+    second = test_client.post(f"/books/{book_id}/borrow", headers=headers)
+    third = test_client.post(f"/books/{book_id}/borrow", headers=headers)
+
+    assert first.status_code == second.status_code == status.HTTP_200_OK
+    assert first.json()["copy_id"] != second.json()["copy_id"]
+    assert third.status_code == status.HTTP_400_BAD_REQUEST
+
+    test_client.post(f"/books/{book_id}/return", headers=headers)
+    book = test_client.get(f"/books/batch?ids={book_id}").json()["books"][0]
+    assert book["total_copies"] == 2
+    assert book["available_copies"] == 1
+    assert book["available"] is True
+
+
+@pytest.fixture
+def second_member_token(test_client):
+    test_client.post(
+        "/auth/signup",
+        json={
+            "username": "seconduser",
+            "email": "second@example.com",
+            "password": "secondpass",
+            "role": "member",
+        },
+    )
+    login_response = test_client.post(
+        "/auth/login",
+        data={"username": "second@example.com", "password": "secondpass"},
+    )
+    return login_response.json()["access_token"]
+
+
+@pytest.mark.user
+def test_return_hands_copy_to_next_hold(
+    test_client, member_token, second_member_token, create_test_book
+):
+    """A returned copy goes to the first waiting hold instead of the shelf."""
+    book_id = create_test_book
+    first = {"Authorization": f"Bearer {member_token}"}
+    second = {"Authorization": f"Bearer {second_member_token}"}
+
+    borrowed = test_client.post(f"/books/{book_id}/borrow", headers=first).json()
+    hold_response = test_client.post(f"/books/{book_id}/hold", headers=second)
+    assert hold_response.status_code == status.HTTP_200_OK, hold_response.json()
+    assert hold_response.json()["status"] == "waiting"
+
+    test_client.post(f"/books/{book_id}/return", headers=first)
+
+    holds = test_client.get("/books/holds", headers=second).json()
+    assert [hold["status"] for hold in holds] == ["ready"]
+    # Set aside for the holder, so nobody else can take it
+    retry = test_client.post(f"/books/{book_id}/borrow", headers=first)
+    assert retry.status_code == status.HTTP_400_BAD_REQUEST
+
+    claimed = test_client.post(f"/books/{book_id}/borrow", headers=second)
+    assert claimed.status_code == status.HTTP_200_OK, claimed.json()
+    assert claimed.json()["copy_id"] == borrowed["copy_id"]
+    assert test_client.get("/books/holds", headers=second).json() == []
+
+
+@pytest.mark.user
+def test_hold_on_available_book_rejected(test_client, member_token, create_test_book):
+    response = test_client.post(
+        f"/books/{create_test_book}/hold",
+        headers={"Authorization": f"Bearer {member_token}"},
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json()["detail"] == "Book is available, borrow it instead"
+
+
+@pytest.mark.user
+def test_added_copies_go_to_waiting_holds(
+    test_client, admin_token, member_token, second_member_token, create_test_book
+):
+    book_id = create_test_book
+    first = {"Authorization": f"Bearer {member_token}"}
+    second = {"Authorization": f"Bearer {second_member_token}"}
+
+    test_client.post(f"/books/{book_id}/borrow", headers=first)
+    test_client.post(f"/books/{book_id}/hold", headers=second)
+
+    response = test_client.put(
+        f"/admin/books/{book_id}",
+        headers={"Authorization": f"Bearer {admin_token}"},
+        json={"title": "Test Book", "author": "Author", "isbn": "1234567891234", "copies": 2},
+    )
+    assert response.status_code == status.HTTP_200_OK, response.json()
+    assert response.json()["available_copies"] == 0
+
+    holds = test_client.get("/books/holds", headers=second).json()
+    assert [hold["status"] for hold in holds] == ["ready"]
+    assert test_client.post(f"/books/{book_id}/borrow", headers=second).status_code == (
+        status.HTTP_200_OK
+    )
+
+
+@pytest.mark.user
+def test_borrow_refused_while_others_wait(
+    test_client, test_db, member_token, second_member_token, create_test_book
+):
+    book_id = create_test_book
+    second_id = int(verify_token(second_member_token)["sub"])
+    # A copy on the shelf while someone is still queued for the title
+    test_db.add(Hold(user_id=second_id, book_id=book_id))
+    test_db.commit()
+
+    response = test_client.post(
+        f"/books/{book_id}/borrow", headers={"Authorization": f"Bearer {member_token}"}
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json()["detail"] == "Book is reserved for members on the waiting list"
+
+    second = {"Authorization": f"Bearer {second_member_token}"}
+    response = test_client.post(f"/books/{book_id}/borrow", headers=second)
+    assert response.status_code == status.HTTP_200_OK, response.json()
+    assert test_client.get("/books/holds", headers=second).json() == []
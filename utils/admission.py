@@ -0,0 +1,180 @@
+# utils/admission.py
+import asyncio
+import math
+import os
+from collections import deque
+
+from utils.env import load_env
+
+load_env()
+
+
+# Route classes, checked in order. The first matching (methods, path prefix)
+# wins; anything else falls back to "write" or "read" by HTTP method.
+AUTH_ROUTES = [
+    ({"POST"}, "/auth/login"),
+    ({"POST"}, "/auth/signup"),
+    ({"POST"}, "/admin/users/bulk"),
+]
+# Reads that use POST only to carry a large body
+READ_ROUTES = [
+    ({"POST"}, "/books/batch"),
+]
+READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, default))
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, default))
+
+
+class RouteClass:
+    """Concurrency limit with a bounded FIFO wait queue for one route class."""
+
+    def __init__(self, name: str, limit: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.admitted = 0
+        self.shed_queue_full = 0
+        self.shed_timeout = 0
+        self._waiters = deque()
+
+    async def acquire(self) -> bool:
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return True
+        if len(self._waiters) >= self.max_queue:
+            self.shed_queue_full += 1
+            return False
+
+        # Futures are created on the running loop at wait time, so the
+        # limiter is not tied to the loop that was current at import.
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.shed_timeout += 1
+            return False
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        # The slot was handed over by release(); active was not decremented.
+        self.admitted += 1
+        return True
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.queue_timeout))
+
+    def snapshot(self) -> dict:
+        return {
+            "limit": self.limit,
+            "max_queue": self.max_queue,
+            "queue_timeout": self.queue_timeout,
+            "active": self.active,
+            "queued": len(self._waiters),
+            "admitted": self.admitted,
+            "shed_queue_full": self.shed_queue_full,
+            "shed_timeout": self.shed_timeout,
+        }
+
+
+def default_route_classes() -> dict[str, RouteClass]:
+    return {
+        "auth": RouteClass(
+            "auth",
+            limit=_env_int("ADMISSION_AUTH_LIMIT", 4),
+            max_queue=_env_int("ADMISSION_AUTH_QUEUE", 32),
+            queue_timeout=_env_float("ADMISSION_AUTH_TIMEOUT", 2.0),
+        ),
+        "write": RouteClass(
+            "write",
+            limit=_env_int("ADMISSION_WRITE_LIMIT", 16),
+            max_queue=_env_int("ADMISSION_WRITE_QUEUE", 64),
+            queue_timeout=_env_float("ADMISSION_WRITE_TIMEOUT", 1.0),
+        ),
+        "read": RouteClass(
+            "read",
+            limit=_env_int("ADMISSION_READ_LIMIT", 32),
+            max_queue=_env_int("ADMISSION_READ_QUEUE", 256),
+            queue_timeout=_env_float("ADMISSION_READ_TIMEOUT", 0.5),
+        ),
+    }
+
+
+def classify(method: str, path: str) -> str:
+    for methods, prefix in AUTH_ROUTES:
+        if method in methods and path.startswith(prefix):
+            return "auth"
+    for methods, prefix in READ_ROUTES:
+        if method in methods and path.startswith(prefix):
+            return "read"
+    if method in READ_METHODS:
+        return "read"
+    return "write"
+
+
+class AdmissionControlMiddleware:
+    """ASGI middleware that sheds load per route class with 503 + Retry-After.
+
+    Each class has its own slots and queue, so a saturated auth class
+    (bcrypt-bound signup/login) never delays cheap reads.
+    """
+
+    def __init__(self, app, route_classes: dict[str, RouteClass] | None = None):
+        self.app = app
+        if route_classes is None:
+            route_classes = ROUTE_CLASSES
+        self.route_classes = route_classes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route_class = self.route_classes[classify(scope["method"], scope["path"])]
+        if not await route_class.acquire():
+            await self._reject(route_class, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route_class.release()
+
+    async def _reject(self, route_class: RouteClass, send):
+        body = b'{"detail":"Server is busy, please retry later"}'
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(route_class.retry_after()).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+
+# Shared by the middleware and the metrics route so both see the same counters.
+ROUTE_CLASSES = default_route_classes()
+
+
+def admission_stats() -> dict:
+    return {name: rc.snapshot() for name, rc in ROUTE_CLASSES.items()}
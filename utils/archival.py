@@ -0,0 +1,130 @@
+# utils/archival.py
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, insert
+from sqlmodel import Session, select
+
+from models.borrow import Borrow, BorrowArchive
+from utils.env import load_env
+
+load_env()
+
+
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", 180))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", 1000))
+
+_COLUMNS = [
+    "id",
+    "branch_id",
+    "user_id",
+    "book_id",
+    "copy_id",
+    "borrowed_at",
+    "due_at",
+    "returned_at",
+    "fine_cents",
+]
+
+
+def archive_returned_loans(
+    db: Session,
+    older_than_days: int = ARCHIVE_AFTER_DAYS,
+    batch_size: int = ARCHIVE_BATCH_SIZE,
+    max_batches: int | None = None,
+    pause: float = 0.0,
+) -> int:
+    """Move loans returned more than `older_than_days` ago to `borrowarchive`.
+
+    Each batch is its own short transaction (copy, then delete by primary
+    key), so the hot table is never locked for long and an interrupted run
+    simply continues where it stopped when started again.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    archived = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        ids = db.exec(
+            select(Borrow.id)
+            .where(Borrow.returned_at != None, Borrow.returned_at < cutoff)
+            .order_by(Borrow.id)
+            .limit(batch_size)
+        ).all()
+        if not ids:
+            break
+
+        columns = [getattr(Borrow, name) for name in _COLUMNS]
+        db.exec(
+            insert(BorrowArchive).from_select(
+                _COLUMNS, select(*columns).where(Borrow.id.in_(ids))
+            )
+        )
+        db.exec(delete(Borrow).where(Borrow.id.in_(ids)))
+        db.commit()
+
+        archived += len(ids)
+        batches += 1
+        if pause:
+            time.sleep(pause)
+    return archived
+
+
+def archive_horizon(db: Session) -> datetime | None:
+    """Latest `borrowed_at` in the archive; no archived loan starts after it."""
+    return db.exec(select(func.max(BorrowArchive.borrowed_at))).one()
+
+
+def user_history(
+    db: Session, user_id: int, branch_id: int, since: datetime | None = None
+) -> list:
+    """Loans of one user, reading the archive only when `since` reaches it."""
+    # Leading on branch_id lets this use ix_borrow_branch_user
+    hot_query = select(Borrow).where(
+        Borrow.branch_id == branch_id, Borrow.user_id == user_id
+    )
+    if since is not None:
+        hot_query = hot_query.where(Borrow.borrowed_at >= since)
+    history = list(db.exec(hot_query).all())
+
+    horizon = archive_horizon(db)
+    if horizon is not None and (since is None or since <= horizon):
+        archive_query = select(BorrowArchive).where(
+            BorrowArchive.user_id == user_id, BorrowArchive.branch_id == branch_id
+        )
+        if since is not None:
+            archive_query = archive_query.where(BorrowArchive.borrowed_at >= since)
+        history.extend(db.exec(archive_query).all())
+        history.sort(key=lambda loan: (loan.borrowed_at, loan.id))
+    return history
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive returned loans")
+    parser.add_argument("--older-than-days", type=int, default=ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    parser.add_argument("--max-batches", type=int, default=None)
+    parser.add_argument(
+        "--pause", type=float, default=0.05, help="Seconds to sleep between batches"
+    )
+    args = parser.parse_args()
+
+    from database import all_engines
+
+    archived = 0
+    # Every branch database, like the in-process scheduler
+    for engine in all_engines():
+        with Session(engine) as db:
+            archived += archive_returned_loans(
+                db,
+                older_than_days=args.older_than_days,
+                batch_size=args.batch_size,
+                max_batches=args.max_batches,
+                pause=args.pause,
+            )
+    print(f"Archived {archived} loans")
+
+
+if __name__ == "__main__":
+    main()
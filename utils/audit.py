@@ -0,0 +1,153 @@
+# utils/audit.py
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import insert
+from sqlmodel import Session
+
+from models.audit import AuditLog
+from utils.env import load_env
+
+load_env()
+
+logger = logging.getLogger("audit")
+
+
+AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE", 10_000))
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", 200))
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", 1.0))
+# "db" (default) or "jsonl:<path>"
+AUDIT_SINK = os.getenv("AUDIT_SINK", "db")
+
+
+class DatabaseSink:
+    def __init__(self, engine):
+        self.engine = engine
+
+    def write(self, events: list[dict]):
+        # One multi-row INSERT per batch
+        with Session(self.engine) as db:
+            db.exec(insert(AuditLog), params=events)
+            db.commit()
+
+
+class JsonlSink:
+    def __init__(self, path: str):
+        self.path = path
+
+    def write(self, events: list[dict]):
+        with open(self.path, "a", encoding="utf-8") as audit_file:
+            for event in events:
+                audit_file.write(json.dumps(event, default=str) + "\n")
+
+
+def create_sink(engine):
+    if AUDIT_SINK.startswith("jsonl:"):
+        return JsonlSink(AUDIT_SINK.removeprefix("jsonl:"))
+    return DatabaseSink(engine)
+
+
+_STOP = object()
+
+
+class AuditLogger:
+    """Write-behind audit trail.
+
+    Requests only enqueue (record() never blocks or touches the database);
+    a background thread writes batches when AUDIT_BATCH_SIZE events are
+    queued or AUDIT_FLUSH_INTERVAL seconds have passed, and drains the queue
+    on shutdown. Loss window: events still queued when the process dies
+    abruptly (at most one flush interval / batch), and events dropped while
+    the queue is full, which are counted in `dropped`.
+    """
+
+    def __init__(
+        self,
+        max_queue: int = AUDIT_QUEUE_SIZE,
+        batch_size: int = AUDIT_BATCH_SIZE,
+        flush_interval: float = AUDIT_FLUSH_INTERVAL,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+
+    def record(self, event: str, actor_id=None, target=None, **details):
+        try:
+            self._queue.put_nowait(
+                {
+                    "created_at": datetime.utcnow(),
+                    "event": event,
+                    "actor_id": actor_id,
+                    "target": target,
+                    "details": json.dumps(details, default=str) if details else None,
+                }
+            )
+        except queue.Full:
+            self.dropped += 1
+
+    def start(self, sink):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._run, args=(sink,), name="audit-writer", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        if self._thread is None:
+            return
+        # Blocks briefly if the queue is full; the sentinel must get in
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self, sink):
+        while True:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            stopping = False
+            while len(batch) < self.batch_size:
+                try:
+                    event = self._queue.get(
+                        timeout=max(0.0, deadline - time.monotonic())
+                    )
+                except queue.Empty:
+                    break
+                if event is _STOP:
+                    stopping = True
+                    break
+                batch.append(event)
+            if batch:
+                self._flush(sink, batch)
+            if stopping:
+                self._drain(sink)
+                return
+
+    def _drain(self, sink):
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            if len(batch) == self.batch_size:
+                self._flush(sink, batch)
+                batch = []
+        if batch:
+            self._flush(sink, batch)
+
+    def _flush(self, sink, batch):
+        try:
+            sink.write(batch)
+        except Exception:
+            logger.exception("Dropped %d audit events", len(batch))
+
+
+audit_log = AuditLogger()
@@ -0,0 +1,49 @@
+# utils/branches.py
+import os
+
+from fastapi import HTTPException, Request
+
+from utils.env import load_env
+
+load_env()
+
+
+DEFAULT_BRANCH_ID = int(os.getenv("DEFAULT_BRANCH_ID", 1))
+BRANCH_HEADER = "x-branch-id"
+
+
+def parse_branch_urls(value: str) -> dict[int, str]:
+    """Parse BRANCH_DATABASE_URLS, e.g. "2=mysql+pymysql://...;3=mysql+pymysql://..."."""
+    urls = {}
+    for item in value.split(";"):
+        if not item.strip():
+            continue
+        branch_id, _, url = item.partition("=")
+        urls[int(branch_id)] = url.strip()
+    return urls
+
+
+def resolve_branch(authorization: str | None, branch_header: str | None) -> int:
+    """Branch of a request: the token's `branch` claim, else X-Branch-Id, else
+    DEFAULT_BRANCH_ID. A signed claim always wins over the header."""
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        # Imported here so database.py (and alembic) do not need the JWT settings
+        from utils.security import verify_token
+
+        payload = verify_token(token)
+        if payload and payload.get("branch") is not None:
+            return int(payload["branch"])
+    if branch_header:
+        try:
+            return int(branch_header)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="X-Branch-Id must be an integer")
+    return DEFAULT_BRANCH_ID
+
+
+# Dependency: resolved before the session so the session can be routed
+def get_branch_id(request: Request) -> int:
+    return resolve_branch(
+        request.headers.get("authorization"), request.headers.get(BRANCH_HEADER)
+    )
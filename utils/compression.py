@@ -0,0 +1,266 @@
+# utils/compression.py
+import gzip
+import hashlib
+import os
+import threading
+import zlib
+from collections import OrderedDict
+
+from utils.env import load_env
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional
+    zstandard = None
+
+load_env()
+
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", 6))
+# Total bytes of compressed bodies kept for reuse
+COMPRESSION_CACHE_BYTES = int(os.getenv("COMPRESSION_CACHE_BYTES", 32 * 1024 * 1024))
+
+COMPRESSIBLE_TYPES = (b"application/json", b"text/")
+
+
+class GzipEncoder:
+    name = "gzip"
+
+    def __init__(self):
+        # wbits=31 writes a gzip header, same as gzip.compress
+        self._compressor = zlib.compressobj(COMPRESSION_GZIP_LEVEL, wbits=31)
+
+    @staticmethod
+    def compress(body: bytes) -> bytes:
+        return gzip.compress(body, COMPRESSION_GZIP_LEVEL, mtime=0)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class BrotliEncoder:
+    name = "br"
+
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=5)
+
+    @staticmethod
+    def compress(body: bytes) -> bytes:
+        return brotli.compress(body, quality=5)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class ZstdEncoder:
+    name = "zstd"
+
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=3).compressobj()
+
+    @staticmethod
+    def compress(body: bytes) -> bytes:
+        return zstandard.ZstdCompressor(level=3).compress(body)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+# Server preference when the client rates several encodings equally
+ENCODERS = {"gzip": GzipEncoder}
+if brotli is not None:
+    ENCODERS = {"br": BrotliEncoder, **ENCODERS}
+if zstandard is not None:
+    ENCODERS = {"zstd": ZstdEncoder, **ENCODERS}
+
+
+def negotiate(accept_encoding: str, encoders: dict = ENCODERS):
+    """Pick the encoder for an Accept-Encoding header, or None for identity."""
+    ratings = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        ratings[name.strip().lower()] = quality
+
+    best, best_quality = None, 0.0
+    for name, encoder in encoders.items():
+        quality = ratings.get(name, ratings.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoder, quality
+    return best
+
+
+class CompressedBodyCache:
+    """LRU of compressed bodies keyed by (content digest, encoding).
+
+    Hashing a body is far cheaper than compressing it, so a hot payload
+    such as the catalog is compressed once per distinct content rather than
+    once per request.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compress(self, body: bytes, encoder) -> bytes:
+        key = (hashlib.blake2b(body, digest_size=16).digest(), encoder.name)
+        with self._lock:
+            compressed = self._entries.get(key)
+            if compressed is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return compressed
+            self.misses += 1
+
+        compressed = encoder.compress(body)
+        if len(compressed) > self.max_bytes:
+            return compressed
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = compressed
+                self.size += len(compressed)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+        return compressed
+
+
+body_cache = CompressedBodyCache(COMPRESSION_CACHE_BYTES)
+
+
+class CompressionMiddleware:
+    """Compresses JSON/text responses larger than `minimum_size`.
+
+    Single-message responses (the normal JSONResponse case) go through the
+    compressed body cache; streamed responses are compressed chunk by chunk.
+    """
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = COMPRESSION_MIN_SIZE,
+        cache: CompressedBodyCache | None = None,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.cache = cache if cache is not None else body_cache
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = dict(scope["headers"]).get(b"accept-encoding", b"")
+        encoder_class = negotiate(accept_encoding.decode("latin-1"))
+        if encoder_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        encoder = None  # set once we know the response is being streamed
+
+        async def compressing_send(message):
+            nonlocal start, encoder
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body" or start is None:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if encoder is not None:
+                data = encoder.chunk(body)
+                if not more_body:
+                    data += encoder.finish()
+                await send(
+                    {"type": "http.response.body", "body": data, "more_body": more_body}
+                )
+                return
+
+            headers = start["headers"]
+            if not self._compressible(headers) or (
+                not more_body and len(body) < self.minimum_size
+            ):
+                await send(start)
+                start = None
+                await send(message)
+                return
+
+            if not more_body:
+                compressed = self.cache.get_or_compress(body, encoder_class)
+                await send(
+                    {
+                        **start,
+                        "headers": self._headers(headers, encoder_class, compressed),
+                    }
+                )
+                start = None
+                await send({"type": "http.response.body", "body": compressed})
+                return
+
+            encoder = encoder_class()
+            await send(
+                {**start, "headers": self._headers(headers, encoder_class, None)}
+            )
+            await send(
+                {
+                    "type": "http.response.body",
+                    "body": encoder.chunk(body),
+                    "more_body": True,
+                }
+            )
+
+        await self.app(scope, receive, compressing_send)
+
+    @staticmethod
+    def _compressible(headers) -> bool:
+        content_type = b""
+        for name, value in headers:
+            name = name.lower()
+            if name == b"content-encoding":
+                return False
+            if name == b"content-type":
+                content_type = value.lower()
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+
+    @staticmethod
+    def _headers(headers, encoder_class, compressed: bytes | None):
+        vary = [value for name, value in headers if name.lower() == b"vary"]
+        headers = [
+            (name, value)
+            for name, value in headers
+            if name.lower() not in (b"content-length", b"vary")
+        ]
+        # Caches must key compressed and identity bodies separately.
+        vary.append(b"Accept-Encoding")
+        headers.append((b"content-encoding", encoder_class.name.encode()))
+        headers.append((b"vary", b", ".join(vary)))
+        if compressed is not None:
+            headers.append((b"content-length", str(len(compressed)).encode()))
+        return headers
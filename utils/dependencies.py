@@ -3,6 +3,7 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlmodel import Session, select
 from database import get_session
+from utils.branches import get_branch_id
 from utils.security import verify_token
 from models.user import User
 
@@ -10,7 +11,9 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 
 def get_current_user(
-    token: str = Depends(oauth2_scheme), db: Session = Depends(get_session)
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_session),
+    branch_id: int = Depends(get_branch_id),
 ):
     payload = verify_token(token)
     if not payload:
@@ -19,6 +22,12 @@ def get_current_user(
     user = db.exec(select(User).where(User.id == int(payload.get("sub")))).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
+    # Tokens without a branch claim must not reach into another branch via
+    # the X-Branch-Id header.
+    if user.branch_id != branch_id:
+        raise HTTPException(
+            status_code=403, detail="Access forbidden: user belongs to another branch"
+        )
 
     return user
 
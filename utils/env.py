@@ -0,0 +1,22 @@
+# utils/env.py
+import os
+
+ENV_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".env"
+)
+
+_loaded = False
+
+
+def load_env():
+    # Reads .env once per process. Deployments that pass configuration as
+    # real environment variables have no .env, so python-dotenv is not even
+    # imported there.
+    global _loaded
+    if _loaded:
+        return
+    _loaded = True
+    if os.path.exists(ENV_FILE):
+        from dotenv import load_dotenv
+
+        load_dotenv(ENV_FILE)
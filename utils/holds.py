@@ -0,0 +1,210 @@
+# utils/holds.py
+import argparse
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+from sqlmodel import Session, select
+
+from models.hold import Hold, HoldStatus
+from utils.env import load_env
+from utils.inventory import checkin_copy, checkout_copy
+
+load_env()
+
+
+HOLD_PICKUP_HOURS = int(os.getenv("HOLD_PICKUP_HOURS", 48))
+HOLD_SWEEP_BATCH_SIZE = int(os.getenv("HOLD_SWEEP_BATCH_SIZE", 500))
+
+ACTIVE_STATUSES = (HoldStatus.waiting, HoldStatus.ready)
+
+# None of these functions commit; they run inside the caller's transaction so
+# that e.g. a return and the hand-over to the next holder succeed or fail
+# together. Status changes are guarded UPDATEs (`... WHERE status = :from`),
+# like the counters in utils/inventory.py: when a borrow, a cancel and an
+# expiry sweep (possibly on another host) race for the same hold, only one
+# of them moves it and only that one touches the reserved copy.
+
+
+def _move(db: Session, hold_id: int, from_status: HoldStatus, *where, **values) -> bool:
+    moved = db.exec(
+        update(Hold)
+        .where(Hold.id == hold_id, Hold.status == from_status, *where)
+        .values(**values)
+    )
+    return moved.rowcount == 1
+
+
+def active_hold(db: Session, user_id: int, book_id: int) -> Hold | None:
+    return db.exec(
+        select(Hold).where(
+            Hold.user_id == user_id,
+            Hold.book_id == book_id,
+            Hold.status.in_(ACTIVE_STATUSES),
+        )
+    ).first()
+
+
+def release_copy(db: Session, book_id: int, copy_id: int | None):
+    """Give a returned copy to the next holder, or put it back on the shelf."""
+    while True:
+        next_hold = db.exec(
+            select(Hold.id)
+            .where(Hold.book_id == book_id, Hold.status == HoldStatus.waiting)
+            .order_by(Hold.created_at, Hold.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        ).first()
+        if next_hold is None:
+            checkin_copy(db, book_id, copy_id)
+            return
+
+        # The copy stays checked out of the inventory, reserved for the holder.
+        now = datetime.utcnow()
+        if _move(
+            db,
+            next_hold,
+            HoldStatus.waiting,
+            status=HoldStatus.ready,
+            copy_id=copy_id,
+            ready_at=now,
+            expires_at=now + timedelta(hours=HOLD_PICKUP_HOURS),
+        ):
+            return
+        # Cancelled meanwhile; try the next one in the queue
+
+
+def release_added_copies(db: Session, book_id: int, count: int):
+    """Hand copies just added to the shelf to waiting holders first."""
+    waiting = len(
+        db.exec(
+            select(Hold.id)
+            .where(Hold.book_id == book_id, Hold.status == HoldStatus.waiting)
+            .limit(count)
+        ).all()
+    )
+    for _ in range(waiting):
+        reserved, copy_id = checkout_copy(db, book_id)
+        if not reserved:
+            return
+        release_copy(db, book_id, copy_id)
+
+
+def queued_ahead(db: Session, user_id: int, book_id: int) -> bool:
+    """Whether another member is waiting for the title ahead of this user.
+
+    Copies on the shelf while holds are waiting belong to the queue, so a
+    walk-in borrow must not take them.
+    """
+    own = db.exec(
+        select(Hold).where(
+            Hold.user_id == user_id,
+            Hold.book_id == book_id,
+            Hold.status == HoldStatus.waiting,
+        )
+    ).first()
+    query = select(Hold.id).where(
+        Hold.book_id == book_id,
+        Hold.status == HoldStatus.waiting,
+        Hold.user_id != user_id,
+    )
+    if own is not None:
+        query = query.where(Hold.created_at < own.created_at)
+    return db.exec(query.limit(1)).first() is not None
+
+
+def claim_ready_hold(db: Session, user_id: int, book_id: int) -> Hold | None:
+    """Mark the user's ready hold as fulfilled; its copy is already reserved.
+
+    A hold past its pickup time is left to the expiry sweep, which passes
+    the copy on.
+    """
+    now = datetime.utcnow()
+    hold = db.exec(
+        select(Hold).where(
+            Hold.user_id == user_id,
+            Hold.book_id == book_id,
+            Hold.status == HoldStatus.ready,
+            Hold.expires_at >= now,
+        )
+    ).first()
+    if hold is None or not _move(
+        db, hold.id, HoldStatus.ready, Hold.expires_at >= now, status=HoldStatus.fulfilled
+    ):
+        return None
+    return hold
+
+
+def fulfil_waiting_hold(db: Session, user_id: int, book_id: int):
+    """Close the user's place in the queue after they borrowed a shelf copy."""
+    hold_id = db.exec(
+        select(Hold.id).where(
+            Hold.user_id == user_id,
+            Hold.book_id == book_id,
+            Hold.status == HoldStatus.waiting,
+        )
+    ).first()
+    if hold_id is not None:
+        _move(db, hold_id, HoldStatus.waiting, status=HoldStatus.fulfilled)
+
+
+def cancel_hold(db: Session, hold: Hold) -> bool:
+    """Cancel a waiting or ready hold; False if it is no longer active."""
+    if _move(db, hold.id, HoldStatus.waiting, status=HoldStatus.cancelled):
+        return True
+    # Ready (possibly only just): the copy set aside goes to the next holder
+    if _move(db, hold.id, HoldStatus.ready, status=HoldStatus.cancelled):
+        release_copy(db, hold.book_id, hold.copy_id)
+        return True
+    return False
+
+
+def expire_holds(
+    db: Session, now: datetime | None = None, batch_size: int = HOLD_SWEEP_BATCH_SIZE
+) -> int:
+    """Expire ready holds that were not picked up and pass their copies on.
+
+    Works in committed batches over the (status, expires_at) index.
+    """
+    now = now or datetime.utcnow()
+    expired = 0
+    while True:
+        holds = db.exec(
+            select(Hold.id, Hold.book_id, Hold.copy_id)
+            .where(Hold.status == HoldStatus.ready, Hold.expires_at < now)
+            .order_by(Hold.expires_at, Hold.id)
+            .limit(batch_size)
+        ).all()
+        if not holds:
+            return expired
+        for hold_id, book_id, copy_id in holds:
+            # Skipped if the holder borrowed it or another sweep got there first
+            if _move(
+                db,
+                hold_id,
+                HoldStatus.ready,
+                Hold.expires_at < now,
+                status=HoldStatus.expired,
+            ):
+                release_copy(db, book_id, copy_id)
+                expired += 1
+        db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Expire unclaimed holds")
+    parser.add_argument("--batch-size", type=int, default=HOLD_SWEEP_BATCH_SIZE)
+    args = parser.parse_args()
+
+    from database import all_engines
+
+    expired = 0
+    # Every branch database, like the in-process scheduler
+    for engine in all_engines():
+        with Session(engine) as db:
+            expired += expire_holds(db, batch_size=args.batch_size)
+    print(f"Expired {expired} holds")
+
+
+if __name__ == "__main__":
+    main()
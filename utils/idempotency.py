@@ -0,0 +1,391 @@
+# utils/idempotency.py
+import asyncio
+import base64
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from utils.env import load_env
+
+try:
+    from redis import asyncio as redis_asyncio
+except ImportError:  # optional, only needed for the shared store
+    redis_asyncio = None
+
+load_env()
+
+
+IDEMPOTENCY_HEADER = b"idempotency-key"
+
+# (methods, path pattern) of the write routes that honour Idempotency-Key
+IDEMPOTENT_ROUTES = [
+    ({"POST"}, re.compile(r"^/books/\d+/(borrow|return|hold)$")),
+    ({"POST", "PUT", "DELETE"}, re.compile(r"^/admin/")),
+]
+
+
+class _Entry:
+    def __init__(self, body_digest: str = ""):
+        self.body_digest = body_digest  # a retry must carry the same body
+        self.response = None  # (status, headers, body) once completed
+        self.expires_at = None
+        self.abandoned = False
+        self.waiters = []  # (loop, future) of coalesced duplicates
+
+    def notify(self):
+        for loop, future in self.waiters:
+            loop.call_soon_threadsafe(_resolve, future)
+        self.waiters.clear()
+
+
+class _RedisEntry(_Entry):
+    def __init__(self, key: str, body_digest: str = ""):
+        super().__init__(body_digest)
+        self.key = key
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class IdempotencyStore:
+    """Bounded LRU of completed responses (with TTL) and in-flight requests.
+
+    `begin`, `complete` and `abandon` are coroutines so the middleware can
+    use this store and RedisIdempotencyStore alike; here they never block.
+    """
+
+    def __init__(self, max_keys: int, ttl_seconds: float):
+        self.max_keys = max_keys
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def begin(self, key: str, body_digest: str = "") -> tuple[_Entry, bool]:
+        """Return (entry, owner). Only the owner executes the request."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            live = entry is not None and (
+                entry.expires_at is None or entry.expires_at > now
+            )
+            if live:
+                self._entries.move_to_end(key)
+                return entry, False
+            entry = _Entry(body_digest)
+            self._entries[key] = entry
+            self._evict()
+            return entry, True
+
+    def wait(self, entry: _Entry):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            if entry.response is not None or entry.abandoned:
+                future.set_result(None)
+            else:
+                entry.waiters.append((loop, future))
+        return future
+
+    async def complete(self, entry: _Entry, response: tuple):
+        with self._lock:
+            entry.response = response
+            entry.expires_at = time.monotonic() + self.ttl_seconds
+            entry.notify()
+
+    async def abandon(self, key: str, entry: _Entry):
+        # Failed requests are not cached; waiters retry on their own.
+        with self._lock:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+            entry.abandoned = True
+            entry.notify()
+
+    def reset(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _evict(self):
+        # Drop the least recently used completed responses; in-flight
+        # requests are never evicted.
+        while len(self._entries) > self.max_keys:
+            for key, entry in self._entries.items():
+                if entry.response is not None:
+                    del self._entries[key]
+                    break
+            else:
+                return
+
+
+class RedisIdempotencyStore:
+    """Entries shared by every worker through a Redis server.
+
+    A retry that lands on another worker still replays the stored response.
+    Duplicates of an in-flight request poll for its result. Uses the asyncio
+    client, so no Redis round trip blocks the event loop.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        ttl_seconds: float,
+        pending_ttl: float,
+        prefix: str = "idempotency:",
+        poll_interval: float = 0.05,
+        client=None,
+    ):
+        if client is None:
+            if redis_asyncio is None:
+                raise RuntimeError(
+                    "The redis package is required for IDEMPOTENCY_REDIS_URL"
+                )
+            client = redis_asyncio.Redis.from_url(url)
+        self.ttl_seconds = ttl_seconds
+        # An owner that dies mid-request frees its key after this long
+        self.pending_ttl = pending_ttl
+        self.prefix = prefix
+        self.poll_interval = poll_interval
+        self._client = client
+
+    async def begin(self, key: str, body_digest: str = "") -> tuple[_Entry, bool]:
+        pending = json.dumps({"digest": body_digest})
+        while True:
+            if await self._client.set(
+                self.prefix + key, pending, nx=True, ex=math.ceil(self.pending_ttl)
+            ):
+                return _RedisEntry(key, body_digest), True
+            stored = await self._client.get(self.prefix + key)
+            if stored is not None:
+                return self._decode(key, stored), False
+            # Expired between SET and GET; try to take it again
+
+    async def wait(self, entry: _RedisEntry):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            stored = await self._client.get(self.prefix + entry.key)
+            if stored is None or self._decode(entry.key, stored).response is not None:
+                return
+
+    async def complete(self, entry: _RedisEntry, response: tuple):
+        status_code, headers, body = response
+        await self._client.set(
+            self.prefix + entry.key,
+            json.dumps(
+                {
+                    "digest": entry.body_digest,
+                    "status": status_code,
+                    "headers": [
+                        [name.decode("latin-1"), value.decode("latin-1")]
+                        for name, value in headers
+                    ],
+                    "body": base64.b64encode(body).decode(),
+                }
+            ),
+            ex=math.ceil(self.ttl_seconds),
+        )
+
+    async def abandon(self, key: str, entry: _RedisEntry):
+        await self._client.delete(self.prefix + key)
+
+    async def reset(self):
+        async for key in self._client.scan_iter(self.prefix + "*"):
+            await self._client.delete(key)
+
+    @staticmethod
+    def _decode(key: str, stored: bytes) -> _RedisEntry:
+        data = json.loads(stored)
+        entry = _RedisEntry(key, data["digest"])
+        if "status" in data:
+            entry.response = (
+                data["status"],
+                [
+                    (name.encode("latin-1"), value.encode("latin-1"))
+                    for name, value in data["headers"]
+                ],
+                base64.b64decode(data["body"]),
+            )
+        return entry
+
+
+WAIT_TIMEOUT = float(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT", 30))
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", 24 * 60 * 60))
+
+
+def create_store():
+    url = os.getenv("IDEMPOTENCY_REDIS_URL")
+    if url:
+        return RedisIdempotencyStore(
+            url, ttl_seconds=IDEMPOTENCY_TTL_SECONDS, pending_ttl=WAIT_TIMEOUT * 2
+        )
+    return IdempotencyStore(
+        max_keys=int(os.getenv("IDEMPOTENCY_MAX_KEYS", 10_000)),
+        ttl_seconds=IDEMPOTENCY_TTL_SECONDS,
+    )
+
+
+store = create_store()
+
+
+def _is_idempotent_route(method: str, path: str) -> bool:
+    return any(
+        method in methods and pattern.match(path)
+        for methods, pattern in IDEMPOTENT_ROUTES
+    )
+
+
+def _scoped_key(scope, idempotency_key: bytes) -> str:
+    # Keys are scoped to the caller's credentials and the route, so two users
+    # (or two routes) reusing the same key never see each other's responses.
+    headers = dict(scope["headers"])
+    digest = hashlib.sha256()
+    for part in (
+        headers.get(b"authorization", b""),
+        scope["method"].encode(),
+        scope["path"].encode(),
+        idempotency_key,
+    ):
+        digest.update(part)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+async def _read_body(receive) -> bytes | None:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+def _replay_body(body: bytes, receive):
+    sent = False
+
+    async def replay():
+        nonlocal sent
+        if sent:
+            # Later calls wait for the disconnect, as with the real channel
+            return await receive()
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    return replay
+
+
+class IdempotencyMiddleware:
+    """Replays stored responses for repeated Idempotency-Key write requests.
+
+    A duplicate that arrives while the first request is still running waits
+    for it and receives the same response instead of repeating the DB work.
+    Responses with status >= 500 are not stored.
+    """
+
+    def __init__(self, app, idempotency_store: IdempotencyStore | None = None):
+        self.app = app
+        if idempotency_store is None:
+            idempotency_store = store
+        self.store = idempotency_store
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _is_idempotent_route(
+            scope["method"], scope["path"]
+        ):
+            await self.app(scope, receive, send)
+            return
+        idempotency_key = dict(scope["headers"]).get(IDEMPOTENCY_HEADER)
+        if not idempotency_key:
+            await self.app(scope, receive, send)
+            return
+
+        # The body is read up front so a reused key with a different payload
+        # is rejected instead of silently replaying the first response.
+        request_body = await _read_body(receive)
+        if request_body is None:  # client disconnected
+            return
+        body_digest = hashlib.sha256(request_body).hexdigest()
+        receive = _replay_body(request_body, receive)
+
+        key = _scoped_key(scope, idempotency_key)
+        deadline = time.monotonic() + WAIT_TIMEOUT
+        while True:
+            entry, owner = await self.store.begin(key, body_digest)
+            if owner:
+                await self._run_and_store(key, entry, scope, receive, send)
+                return
+            if entry.body_digest != body_digest:
+                await self._error(
+                    422,
+                    "Idempotency-Key was already used with a different request body",
+                    send,
+                )
+                return
+            if entry.response is not None:
+                await self._replay(entry.response, send)
+                return
+            try:
+                await asyncio.wait_for(
+                    self.store.wait(entry), max(0, deadline - time.monotonic())
+                )
+            except asyncio.TimeoutError:
+                await self._error(
+                    409, "A request with this Idempotency-Key is still in progress", send
+                )
+                return
+            # Either completed (replayed on the next pass) or abandoned, in
+            # which case this request becomes the new owner.
+
+    async def _run_and_store(self, key, entry, scope, receive, send):
+        start = {}
+        body = []
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                start.update(message)
+            elif message["type"] == "http.response.body":
+                body.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, capture)
+        except BaseException:
+            await self.store.abandon(key, entry)
+            raise
+        if start and start["status"] < 500:
+            await self.store.complete(
+                entry, (start["status"], list(start["headers"]), b"".join(body))
+            )
+        else:
+            await self.store.abandon(key, entry)
+
+    async def _replay(self, response, send):
+        status_code, headers, body = response
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status_code,
+                "headers": headers + [(b"idempotent-replayed", b"true")],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+    async def _error(self, status_code: int, detail: str, send):
+        body = json.dumps({"detail": detail}).encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status_code,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,88 @@
+# utils/inventory.py
+from sqlalchemy import update
+from sqlmodel import Session, select
+
+from models.book import Book, BookCopy
+
+# Availability is tracked twice: per title in Book.available_copies and per
+# copy in BookCopy.available. Every change goes through a guarded UPDATE
+# (`... WHERE available_copies > 0`) so concurrent borrows can never take the
+# same copy or drive a counter negative, without locking the book row up front.
+# None of these functions commit; callers keep them in their own transaction.
+
+
+def add_copies(db: Session, book: Book, count: int):
+    db.add_all(BookCopy(book_id=book.id) for _ in range(count))
+    db.exec(
+        update(Book)
+        .where(Book.id == book.id)
+        .values(
+            total_copies=Book.total_copies + count,
+            available_copies=Book.available_copies + count,
+        )
+    )
+
+
+def withdraw_copies(db: Session, book: Book, count: int) -> bool:
+    """Take `count` copies on the shelf out of circulation."""
+    taken = db.exec(
+        update(Book)
+        .where(Book.id == book.id, Book.available_copies >= count)
+        .values(
+            total_copies=Book.total_copies - count,
+            available_copies=Book.available_copies - count,
+        )
+    )
+    if taken.rowcount != 1:
+        return False
+    for _ in range(count):
+        _claim_copy(db, book.id, withdraw=True)
+    return True
+
+
+def checkout_copy(db: Session, book_id: int) -> tuple[bool, int | None]:
+    """Reserve one copy. Returns (ok, copy_id); copy_id is None for titles
+    that predate copy tracking and therefore have no BookCopy rows."""
+    taken = db.exec(
+        update(Book)
+        .where(Book.id == book_id, Book.available_copies > 0)
+        .values(available_copies=Book.available_copies - 1)
+    )
+    if taken.rowcount != 1:
+        return False, None
+    return True, _claim_copy(db, book_id)
+
+
+def checkin_copy(db: Session, book_id: int, copy_id: int | None):
+    if copy_id is not None:
+        db.exec(update(BookCopy).where(BookCopy.id == copy_id).values(available=True))
+    db.exec(
+        update(Book)
+        .where(Book.id == book_id)
+        .values(available_copies=Book.available_copies + 1)
+    )
+
+
+def _claim_copy(db: Session, book_id: int, withdraw: bool = False) -> int | None:
+    # The title counter was already decremented, so a free copy exists unless
+    # the title has no copy rows at all; retry only when racing another claim.
+    while True:
+        candidates = db.exec(
+            select(BookCopy.id)
+            .where(
+                BookCopy.book_id == book_id,
+                BookCopy.available == True,
+                BookCopy.withdrawn == False,
+            )
+            .limit(5)
+        ).all()
+        if not candidates:
+            return None
+        for copy_id in candidates:
+            claimed = db.exec(
+                update(BookCopy)
+                .where(BookCopy.id == copy_id, BookCopy.available == True)
+                .values(available=False, withdrawn=withdraw)
+            )
+            if claimed.rowcount == 1:
+                return copy_id
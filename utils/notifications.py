@@ -0,0 +1,33 @@
+# utils/notifications.py
+import logging
+
+logger = logging.getLogger("notifications")
+
+
+# A sink receives batches of notification dicts. Swap the module-level sink
+# with set_sink() to deliver through email, a message queue, etc.
+class LogSink:
+    def send(self, notifications: list[dict]):
+        for notification in notifications:
+            logger.info("notification %s", notification)
+
+
+class MemorySink:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, notifications: list[dict]):
+        self.sent.extend(notifications)
+
+
+sink = LogSink()
+
+
+def set_sink(new_sink):
+    global sink
+    sink = new_sink
+
+
+def send(notifications: list[dict]):
+    if notifications:
+        sink.send(notifications)
@@ -0,0 +1,129 @@
+# utils/overdue.py
+import os
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, or_, update
+from sqlmodel import Session, select
+
+from models.borrow import Borrow
+from utils import notifications
+from utils.env import load_env
+
+load_env()
+
+
+LOAN_PERIOD_DAYS = int(os.getenv("LOAN_PERIOD_DAYS", 14))
+FINE_PER_DAY_CENTS = int(os.getenv("FINE_PER_DAY_CENTS", 25))
+FINE_MAX_CENTS = int(os.getenv("FINE_MAX_CENTS", 2000))
+OVERDUE_SWEEP_BATCH_SIZE = int(os.getenv("OVERDUE_SWEEP_BATCH_SIZE", 500))
+# Sleep between batches so the sweep never holds a DB connection or the GIL
+# for long stretches while foreground requests are running.
+OVERDUE_SWEEP_PAUSE = float(os.getenv("OVERDUE_SWEEP_PAUSE", 0.01))
+NOTIFY_EVERY = timedelta(days=1)
+
+
+def due_date(borrowed_at: datetime) -> datetime:
+    return borrowed_at + timedelta(days=LOAN_PERIOD_DAYS)
+
+
+def compute_fine(due_at: datetime | None, now: datetime) -> int:
+    if due_at is None or now <= due_at:
+        return 0
+    days_late = (now - due_at).days + 1
+    return min(days_late * FINE_PER_DAY_CENTS, FINE_MAX_CENTS)
+
+
+def _claim_reminder(db: Session, loan_id: int, now: datetime, remind_before: datetime):
+    claimed = db.exec(
+        update(Borrow)
+        .where(
+            Borrow.id == loan_id,
+            Borrow.returned_at == None,
+            or_(
+                Borrow.overdue_notified_at == None,
+                Borrow.overdue_notified_at <= remind_before,
+            ),
+        )
+        .values(overdue_notified_at=now)
+        .execution_options(synchronize_session=None)
+    )
+    return claimed.rowcount == 1
+
+
+def sweep_overdue(
+    db: Session,
+    now: datetime | None = None,
+    batch_size: int = OVERDUE_SWEEP_BATCH_SIZE,
+    pause: float = OVERDUE_SWEEP_PAUSE,
+) -> int:
+    """Update fines on open overdue loans and queue reminder notifications.
+
+    Pages with a (due_at, id) keyset over the (returned_at, due_at) index, so
+    each batch is a short range read and a short transaction.
+    """
+    now = now or datetime.utcnow()
+    last_due, last_id = None, 0
+    swept = 0
+    while True:
+        query = select(
+            Borrow.id,
+            Borrow.user_id,
+            Borrow.book_id,
+            Borrow.due_at,
+            Borrow.fine_cents,
+            Borrow.overdue_notified_at,
+        ).where(Borrow.returned_at == None, Borrow.due_at < now)
+        if last_due is not None:
+            query = query.where(
+                or_(
+                    Borrow.due_at > last_due,
+                    and_(Borrow.due_at == last_due, Borrow.id > last_id),
+                )
+            )
+        query = query.order_by(Borrow.due_at, Borrow.id).limit(batch_size)
+        rows = db.exec(query).all()
+        if not rows:
+            return swept
+
+        changes = []
+        due_reminders = []
+        remind_before = now - NOTIFY_EVERY
+        for loan_id, user_id, book_id, due_at, fine_cents, notified_at in rows:
+            fine = compute_fine(due_at, now)
+            if fine != fine_cents:
+                changes.append({"id": loan_id, "fine_cents": fine})
+            if notified_at is None or notified_at <= remind_before:
+                due_reminders.append(
+                    {
+                        "type": "overdue",
+                        "user_id": user_id,
+                        "book_id": book_id,
+                        "borrow_id": loan_id,
+                        "due_at": due_at.isoformat(),
+                        "fine_cents": fine,
+                    }
+                )
+        if changes:
+            # Bulk UPDATE ... WHERE id = :id, one executemany per batch. A loan
+            # returned since the SELECT keeps the final fine return_book set.
+            # The rows were read as tuples, so there are no objects to sync.
+            db.exec(
+                update(Borrow).where(Borrow.returned_at == None),
+                params=changes,
+                execution_options={"synchronize_session": None},
+            )
+        # Claim each reminder with a guarded UPDATE; a sweep running on
+        # another host at the same time claims none of the same loans.
+        reminders = [
+            reminder
+            for reminder in due_reminders
+            if _claim_reminder(db, reminder["borrow_id"], now, remind_before)
+        ]
+        db.commit()
+        notifications.send(reminders)
+
+        swept += len(rows)
+        last_due, last_id = rows[-1][3], rows[-1][0]
+        if pause:
+            time.sleep(pause)
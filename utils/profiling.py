@@ -0,0 +1,308 @@
+# utils/profiling.py
+import asyncio
+import contextvars
+import cProfile
+import functools
+import json
+import os
+import pstats
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import database
+from utils.branches import resolve_branch
+from utils.dependencies import get_current_user, is_admin
+from utils.env import load_env
+
+load_env()
+
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_MAX_CONCURRENT = int(os.getenv("PROFILE_MAX_CONCURRENT", 2))
+PROFILE_STORE_SIZE = int(os.getenv("PROFILE_STORE_SIZE", 50))
+PROFILE_TOP_FUNCTIONS = int(os.getenv("PROFILE_TOP_FUNCTIONS", 40))
+
+# Set only for the duration of a profiled request. Copied into the threadpool
+# with the rest of the request context, so sync routes see it too.
+current_profile = contextvars.ContextVar("current_profile", default=None)
+
+
+class RequestProfile:
+    def __init__(self, method: str, path: str):
+        self.id = uuid.uuid4().hex
+        self.method = method
+        self.path = path
+        self.status = None
+        self.duration_ms = None
+        self.profiler = cProfile.Profile()
+        self.profiled = False
+        self.queries = []
+
+    def report(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "duration_ms": self.duration_ms,
+            "sql": self.queries,
+            "functions": self._functions() if self.profiled else [],
+        }
+
+    def _functions(self) -> list[dict]:
+        stats = pstats.Stats(self.profiler)
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)
+        functions = []
+        for func, (_, ncalls, tottime, cumtime, callers) in rows[
+            :PROFILE_TOP_FUNCTIONS
+        ]:
+            functions.append(
+                {
+                    "function": pstats.func_std_string(func),
+                    "calls": ncalls,
+                    "total_ms": round(tottime * 1000, 3),
+                    "cumulative_ms": round(cumtime * 1000, 3),
+                    "callers": sorted(pstats.func_std_string(c) for c in callers),
+                }
+            )
+        return functions
+
+
+class ProfileStore:
+    """Most recent reports, per worker process."""
+
+    def __init__(self, max_profiles: int):
+        self.max_profiles = max_profiles
+        self._reports = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, report: dict):
+        with self._lock:
+            self._reports[report["id"]] = report
+            while len(self._reports) > self.max_profiles:
+                self._reports.popitem(last=False)
+
+    def get(self, profile_id: str) -> dict | None:
+        with self._lock:
+            return self._reports.get(profile_id)
+
+    def list(self) -> list[dict]:
+        with self._lock:
+            reports = list(self._reports.values())
+        return [
+            {key: report[key] for key in ("id", "method", "path", "status", "duration_ms")}
+            for report in reversed(reports)
+        ]
+
+    def reset(self):
+        with self._lock:
+            self._reports.clear()
+
+
+store = ProfileStore(PROFILE_STORE_SIZE)
+_slots = threading.BoundedSemaphore(PROFILE_MAX_CONCURRENT)
+
+
+# SQL timings. The listeners are attached while at least one profile is
+# running, so unprofiled traffic pays nothing.
+_listeners_lock = threading.Lock()
+_active_profiles = 0
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_profile.get() is not None:
+        conn.info.setdefault("profile_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = current_profile.get()
+    started = conn.info.get("profile_query_start")
+    if profile is None or not started:
+        return
+    profile.queries.append(
+        {
+            "statement": statement,
+            "duration_ms": round((time.perf_counter() - started.pop()) * 1000, 3),
+            "executemany": executemany,
+        }
+    )
+
+
+def _attach_listeners():
+    global _active_profiles
+    with _listeners_lock:
+        if _active_profiles == 0:
+            event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        _active_profiles += 1
+
+
+def _detach_listeners():
+    global _active_profiles
+    with _listeners_lock:
+        _active_profiles -= 1
+        if _active_profiles == 0:
+            event.remove(Engine, "before_cursor_execute", _before_cursor_execute)
+            event.remove(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _run_profiled(profile: RequestProfile, call, *args, **kwargs):
+    try:
+        profile.profiler.enable()
+    except ValueError:
+        # Another profiler already owns this thread
+        return call(*args, **kwargs)
+    profile.profiled = True
+    try:
+        return call(*args, **kwargs)
+    finally:
+        profile.profiler.disable()
+
+
+async def _run_profiled_async(profile: RequestProfile, call, *args, **kwargs):
+    try:
+        profile.profiler.enable()
+    except ValueError:
+        return await call(*args, **kwargs)
+    profile.profiled = True
+    try:
+        return await call(*args, **kwargs)
+    finally:
+        profile.profiler.disable()
+
+
+def _profiled(endpoint):
+    if asyncio.iscoroutinefunction(endpoint):
+
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            profile = current_profile.get()
+            if profile is None:
+                return await endpoint(*args, **kwargs)
+            # Async routes share the event loop thread, so the call tree can
+            # include other requests' coroutines while this one is suspended.
+            return await _run_profiled_async(profile, endpoint, *args, **kwargs)
+
+    else:
+
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            profile = current_profile.get()
+            if profile is None:
+                return endpoint(*args, **kwargs)
+            return _run_profiled(profile, endpoint, *args, **kwargs)
+
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """Route class that runs the endpoint under cProfile for profiled requests."""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _profiled(endpoint), **kwargs)
+
+
+def _authorize(authorization: bytes, branch_header: bytes | None):
+    # Same checks as the `is_admin` dependency, on a session from the same
+    # factory the `get_session` dependency uses.
+    authorization = authorization.decode("latin-1")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    branch_id = resolve_branch(
+        authorization, branch_header.decode("latin-1") if branch_header else None
+    )
+    with database.open_session(branch_id) as db:
+        is_admin(get_current_user(token=token, db=db, branch_id=branch_id))
+
+
+class ProfilingMiddleware:
+    """Profiles requests that carry `X-Profile: 1` from an admin.
+
+    The report (call tree and SQL statements with timings) is stored under
+    the id returned in the `X-Profile-Id` response header. At most
+    PROFILE_MAX_CONCURRENT requests are profiled at once; others run
+    normally with `X-Profile-Skipped: busy`.
+    """
+
+    def __init__(self, app, profile_store: ProfileStore | None = None):
+        self.app = app
+        self.store = profile_store if profile_store is not None else store
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        if headers.get(PROFILE_HEADER) not in (b"1", b"true"):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await run_in_threadpool(
+                _authorize,
+                headers.get(b"authorization", b""),
+                headers.get(b"x-branch-id"),
+            )
+        except HTTPException as exc:
+            await self._reject(exc, send)
+            return
+
+        if not _slots.acquire(blocking=False):
+            skipped_send = self._add_header(send, b"x-profile-skipped", b"busy")
+            await self.app(scope, receive, skipped_send)
+            return
+
+        profile = RequestProfile(scope["method"], scope["path"])
+        _attach_listeners()
+        token = current_profile.set(profile)
+        started = time.perf_counter()
+
+        async def profiled_send(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(
+                scope,
+                receive,
+                self._add_header(profiled_send, b"x-profile-id", profile.id.encode()),
+            )
+        finally:
+            profile.duration_ms = round((time.perf_counter() - started) * 1000, 3)
+            current_profile.reset(token)
+            _detach_listeners()
+            _slots.release()
+            self.store.add(profile.report())
+
+    @staticmethod
+    def _add_header(send, name: bytes, value: bytes):
+        async def wrapped(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message["headers"], (name, value)]}
+            await send(message)
+
+        return wrapped
+
+    async def _reject(self, exc: HTTPException, send):
+        body = json.dumps({"detail": exc.detail}).encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": exc.status_code,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,193 @@
+# utils/provisioning.py
+import csv
+import io
+import json
+import os
+
+from pydantic import ValidationError
+from sqlalchemy import insert, or_
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from models.user import User
+from schemas.user import BulkUserReport, BulkUserResult, UserCreate
+from utils.branches import DEFAULT_BRANCH_ID
+from utils.env import load_env
+from utils.security import hash_passwords
+
+load_env()
+
+
+BULK_USERS_MAX_ROWS = int(os.getenv("BULK_USERS_MAX_ROWS", 50_000))
+BULK_INSERT_BATCH_SIZE = int(os.getenv("BULK_INSERT_BATCH_SIZE", 1000))
+
+
+def parse_rows(body: bytes, content_type: str) -> list[dict]:
+    """Rows from a JSON array of objects or a CSV file with a header line."""
+    if content_type.startswith("text/csv"):
+        return list(csv.DictReader(io.StringIO(body.decode("utf-8-sig"))))
+    rows = json.loads(body)
+    if not isinstance(rows, list):
+        raise ValueError("Expected a JSON array of users")
+    return rows
+
+
+def _as_text(value) -> str | None:
+    # Echo back what the row contained, even when it has the wrong type
+    return None if value is None else str(value)
+
+
+def _validate(rows: list[dict]) -> tuple[dict, list[BulkUserResult]]:
+    valid = {}
+    results = []
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            results.append(
+                BulkUserResult(row=index, status="invalid", detail="Expected an object")
+            )
+            continue
+        # CSV cells are always strings; an empty role means the default one
+        row = {key: value for key, value in row.items() if value not in ("", None)}
+        try:
+            user_data = UserCreate.model_validate(row)
+        except ValidationError as error:
+            results.append(
+                BulkUserResult(
+                    row=index,
+                    username=_as_text(row.get("username")),
+                    email=_as_text(row.get("email")),
+                    status="invalid",
+                    detail="; ".join(e["msg"] for e in error.errors()),
+                )
+            )
+            continue
+        if not user_data.username.strip() or not user_data.password.strip():
+            results.append(
+                BulkUserResult(
+                    row=index,
+                    username=user_data.username,
+                    email=user_data.email,
+                    status="invalid",
+                    detail="Username and password cannot be empty",
+                )
+            )
+            continue
+        valid[index] = user_data
+    return valid, results
+
+
+def _reject_duplicates(
+    db: Session, valid: dict
+) -> tuple[dict, list[BulkUserResult]]:
+    emails = {user_data.email for user_data in valid.values()}
+    usernames = {user_data.username for user_data in valid.values()}
+    # One set-based query for every email/username already registered
+    taken = db.exec(
+        select(User.email, User.username).where(
+            or_(User.email.in_(emails), User.username.in_(usernames))
+        )
+    ).all()
+    taken_emails = {email for email, _ in taken}
+    taken_usernames = {username for _, username in taken}
+
+    accepted = {}
+    results = []
+    for index, user_data in valid.items():
+        if user_data.email in taken_emails:
+            detail = "Email already registered"
+        elif user_data.username in taken_usernames:
+            detail = "Username already taken"
+        else:
+            accepted[index] = user_data
+            # Later rows repeating this email/username are duplicates too
+            taken_emails.add(user_data.email)
+            taken_usernames.add(user_data.username)
+            continue
+        results.append(
+            BulkUserResult(
+                row=index,
+                username=user_data.username,
+                email=user_data.email,
+                status="duplicate",
+                detail=detail,
+            )
+        )
+    return accepted, results
+
+
+def _insert_batch(db: Session, batch: list[tuple[int, dict]]) -> list[BulkUserResult]:
+    try:
+        db.exec(insert(User), params=[values for _, values in batch])
+        db.commit()
+    except IntegrityError:
+        # Lost a race with a concurrent signup; retry row by row to report it
+        db.rollback()
+        if len(batch) > 1:
+            return [
+                result
+                for row in batch
+                for result in _insert_batch(db, [row])
+            ]
+        index, values = batch[0]
+        return [
+            BulkUserResult(
+                row=index,
+                username=values["username"],
+                email=values["email"],
+                status="duplicate",
+                detail="Email or username already registered",
+            )
+        ]
+
+    ids = dict(
+        db.exec(
+            select(User.email, User.id).where(
+                User.email.in_([values["email"] for _, values in batch])
+            )
+        ).all()
+    )
+    return [
+        BulkUserResult(
+            row=index,
+            username=values["username"],
+            email=values["email"],
+            status="created",
+            id=ids.get(values["email"]),
+        )
+        for index, values in batch
+    ]
+
+
+def provision_users(
+    db: Session, rows: list[dict], branch_id: int = DEFAULT_BRANCH_ID
+) -> BulkUserReport:
+    valid, results = _validate(rows)
+    if valid:
+        accepted, duplicates = _reject_duplicates(db, valid)
+        results.extend(duplicates)
+
+        indexes = list(accepted)
+        hashed = hash_passwords([accepted[index].password for index in indexes])
+        values = [
+            (
+                index,
+                {
+                    "username": accepted[index].username,
+                    "email": accepted[index].email,
+                    "hashed_password": hashed_password,
+                    "role": accepted[index].role,
+                    "branch_id": branch_id,
+                },
+            )
+            for index, hashed_password in zip(indexes, hashed)
+        ]
+        for start in range(0, len(values), BULK_INSERT_BATCH_SIZE):
+            results.extend(
+                _insert_batch(db, values[start : start + BULK_INSERT_BATCH_SIZE])
+            )
+
+    results.sort(key=lambda result: result.row)
+    created = sum(1 for result in results if result.status == "created")
+    return BulkUserReport(
+        created=created, failed=len(results) - created, results=results
+    )
@@ -0,0 +1,159 @@
+# utils/rate_limit.py
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.security import OAuth2PasswordRequestForm
+
+from utils.env import load_env
+
+try:
+    import redis
+except ImportError:  # optional, only needed for the shared backend
+    redis = None
+
+load_env()
+
+
+class RateLimit:
+    """Token bucket of `capacity` tokens refilled evenly over `per_seconds`."""
+
+    def __init__(self, capacity: int, per_seconds: float):
+        self.capacity = capacity
+        self.refill_rate = capacity / per_seconds
+
+    @classmethod
+    def parse(cls, value: str) -> "RateLimit":
+        # "10/60" -> 10 attempts per 60 seconds
+        capacity, per_seconds = value.split("/")
+        return cls(int(capacity), float(per_seconds))
+
+
+class InMemoryBackend:
+    """Per-process buckets; correct for a single worker and used in tests."""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key: str, limit: RateLimit) -> float:
+        """Take one token. Returns 0 when allowed, else seconds until a token."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (limit.capacity, now))
+            tokens = min(limit.capacity, tokens + (now - updated) * limit.refill_rate)
+            if tokens >= 1:
+                tokens -= 1
+                retry_after = 0.0
+            else:
+                retry_after = (1 - tokens) / limit.refill_rate
+            self._buckets[key] = (tokens, now)
+            # Least recently used buckets are the ones most likely refilled.
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return retry_after
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+# Atomic refill-and-take on the Redis server so all workers share buckets.
+_REDIS_TOKEN_BUCKET = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + (now - updated) * rate)
+local retry_after = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+else
+  retry_after = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(retry_after)
+"""
+
+
+class RedisBackend:
+    """Buckets shared by every worker through a Redis server."""
+
+    def __init__(self, url: str, prefix: str = "ratelimit:", client=None):
+        if client is None:
+            if redis is None:
+                raise RuntimeError(
+                    "The redis package is required for RATE_LIMIT_REDIS_URL"
+                )
+            client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._client = client
+        self._script = self._client.register_script(_REDIS_TOKEN_BUCKET)
+
+    def consume(self, key: str, limit: RateLimit) -> float:
+        retry_after = self._script(
+            keys=[self.prefix + key],
+            args=[limit.capacity, limit.refill_rate, time.time()],
+        )
+        return float(retry_after)
+
+    def reset(self):
+        for key in self._client.scan_iter(self.prefix + "*"):
+            self._client.delete(key)
+
+
+def create_backend():
+    url = os.getenv("RATE_LIMIT_REDIS_URL")
+    if url:
+        return RedisBackend(url)
+    return InMemoryBackend()
+
+
+backend = create_backend()
+
+LOGIN_LIMIT_PER_IP = RateLimit.parse(os.getenv("LOGIN_RATE_LIMIT_PER_IP", "20/60"))
+LOGIN_LIMIT_PER_EMAIL = RateLimit.parse(os.getenv("LOGIN_RATE_LIMIT_PER_EMAIL", "5/60"))
+SIGNUP_LIMIT_PER_IP = RateLimit.parse(os.getenv("SIGNUP_RATE_LIMIT_PER_IP", "10/60"))
+
+
+# Behind a load balancer this is only the real client when the proxy is
+# trusted (server.py --forwarded-allow-ips / FORWARDED_ALLOW_IPS); otherwise
+# every client shares the balancer's bucket.
+def _client_ip(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+
+def _enforce(key: str, limit: RateLimit, detail: str):
+    retry_after = backend.consume(key, limit)
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=detail,
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+
+
+# Dependencies run before the route body, so throttled attempts never reach
+# the database or bcrypt.
+def limit_login_attempts(
+    request: Request, form_data: OAuth2PasswordRequestForm = Depends()
+):
+    detail = "Too many login attempts, please try again later"
+    _enforce(f"login:ip:{_client_ip(request)}", LOGIN_LIMIT_PER_IP, detail)
+    _enforce(
+        f"login:email:{form_data.username.strip().lower()}",
+        LOGIN_LIMIT_PER_EMAIL,
+        detail,
+    )
+
+
+def limit_signup_attempts(request: Request):
+    detail = "Too many signup attempts, please try again later"
+    _enforce(f"signup:ip:{_client_ip(request)}", SIGNUP_LIMIT_PER_IP, detail)
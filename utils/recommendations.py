@@ -0,0 +1,214 @@
+# utils/recommendations.py
+import argparse
+import os
+from datetime import datetime
+
+from sqlalchemy import delete, func, insert, union
+from sqlmodel import Session, select
+
+from models.borrow import Borrow, BorrowArchive
+from models.recommendation import BookNeighbour, RecommendationState
+from utils.env import load_env
+
+load_env()
+
+
+RELATED_TOP_K = int(os.getenv("RELATED_TOP_K", 10))
+# Pairs borrowed together by fewer readers than this are treated as noise
+RELATED_MIN_SUPPORT = int(os.getenv("RELATED_MIN_SUPPORT", 2))
+RELATED_BATCH_SIZE = int(os.getenv("RELATED_BATCH_SIZE", 1000))
+# Rows fetched per round trip while streaming the ledger
+RELATED_FETCH_SIZE = int(os.getenv("RELATED_FETCH_SIZE", 50_000))
+
+
+def _chunks(ids, size: int = RELATED_BATCH_SIZE):
+    ids = [int(value) for value in ids]
+    for start in range(0, len(ids), size):
+        yield ids[start : start + size]
+
+
+def _ledger(column: str | None = None, ids=None):
+    """Distinct (user_id, book_id) pairs of the live and archived ledger,
+    optionally only those whose `column` is in `ids`."""
+    live = select(Borrow.user_id, Borrow.book_id)
+    archived = select(BorrowArchive.user_id, BorrowArchive.book_id)
+    if column is not None:
+        live = live.where(getattr(Borrow, column).in_(ids))
+        archived = archived.where(getattr(BorrowArchive, column).in_(ids))
+    return union(live, archived)
+
+
+def _load_pairs(db: Session, column: str | None = None, ids=None):
+    """Ledger pairs as an (n, 2) array: all of them, or those of the given
+    readers (`column="user_id"`) or books (`column="book_id"`)."""
+    import numpy as np
+
+    if column is None:
+        queries = [_ledger()]
+    else:
+        queries = [_ledger(column, chunk) for chunk in _chunks(ids)]
+    chunks = [
+        np.asarray(rows, dtype=np.int64).reshape(-1, 2)
+        for query in queries
+        for rows in db.exec(
+            query.execution_options(yield_per=RELATED_FETCH_SIZE)
+        ).partitions()
+    ]
+    if not chunks:
+        return np.empty((0, 2), dtype=np.int64)
+    return np.concatenate(chunks)
+
+
+def _reader_counts(db: Session, books):
+    """Number of distinct readers of each book, aligned with `books`."""
+    import numpy as np
+
+    readers = {}
+    for chunk in _chunks(books):
+        ledger = _ledger("book_id", chunk).subquery()
+        readers.update(
+            db.exec(
+                select(ledger.c.book_id, func.count()).group_by(ledger.c.book_id)
+            ).all()
+        )
+    return np.asarray([readers.get(int(book), 0) for book in books], dtype=np.float64)
+
+
+def _top_neighbours(counts, popularity, rows, top_k: int, min_support: int):
+    """Yield (row, neighbour columns, scores) for each row of a co-count block.
+
+    Scores are cosine similarity of the two books' reader sets:
+    co-borrowers / sqrt(readers_a * readers_b).
+    """
+    import numpy as np
+
+    for offset, row in enumerate(rows):
+        start, end = counts.indptr[offset], counts.indptr[offset + 1]
+        columns = counts.indices[start:end]
+        support = counts.data[start:end]
+        keep = (columns != row) & (support >= min_support)
+        columns, support = columns[keep], support[keep]
+        if not len(columns):
+            yield row, columns, support
+            continue
+        scores = support / np.sqrt(popularity[row] * popularity[columns])
+        if len(scores) > top_k:
+            best = np.argpartition(-scores, top_k - 1)[:top_k]
+            columns, scores = columns[best], scores[best]
+        # Highest score first; ties broken by the lower book id
+        order = np.lexsort((columns, -scores))
+        yield row, columns[order], scores[order]
+
+
+def build_related_books(
+    db: Session,
+    full: bool = False,
+    top_k: int = RELATED_TOP_K,
+    min_support: int = RELATED_MIN_SUPPORT,
+    batch_size: int = RELATED_BATCH_SIZE,
+) -> int:
+    """Refresh `bookneighbour` from the borrow ledger; returns books updated.
+
+    Ledger pairs are loaded into a sparse user x book matrix B, and co-borrow
+    counts come from B.T @ B one block of books at a time. A `full` run loads
+    the whole ledger. An incremental run only recomputes the books read by
+    someone who borrowed since the last run (the only rows whose counts can
+    have changed), so it only loads the history of those books' readers and
+    takes reader totals for the other books from a count query. Scores of
+    other rows are left as they were until the next `full` rebuild.
+    """
+    import numpy as np
+    from scipy import sparse
+
+    state = db.get(RecommendationState, 1) or RecommendationState(id=1)
+    high_water = db.exec(select(func.max(Borrow.id))).one() or 0
+    if not full and high_water <= state.last_borrow_id:
+        return 0
+
+    if full:
+        pairs = _load_pairs(db)
+    else:
+        new_readers = db.exec(
+            select(Borrow.user_id)
+            .where(Borrow.id > state.last_borrow_id, Borrow.id <= high_water)
+            .distinct()
+        ).all()
+        touched = np.unique(_load_pairs(db, "user_id", new_readers)[:, 1])
+        co_readers = np.unique(_load_pairs(db, "book_id", touched)[:, 0])
+        pairs = _load_pairs(db, "user_id", co_readers)
+
+    users, user_index = np.unique(pairs[:, 0], return_inverse=True)
+    books, book_index = np.unique(pairs[:, 1], return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(pairs), dtype=np.float32), (user_index, book_index)),
+        shape=(len(users), len(books)),
+    )
+    by_book = matrix.T.tocsr()
+
+    if full:
+        popularity = np.diff(by_book.indptr).astype(np.float64)
+        rows = np.arange(len(books))
+    else:
+        # Only some readers of the neighbouring books were loaded
+        popularity = _reader_counts(db, books)
+        rows = np.searchsorted(books, touched)
+
+    for start in range(0, len(rows), batch_size):
+        block = rows[start : start + batch_size]
+        counts = (by_book[block] @ matrix).tocsr()
+        counts.sort_indices()
+        neighbours = []
+        for row, columns, scores in _top_neighbours(
+            counts, popularity, block, top_k, min_support
+        ):
+            neighbours.extend(
+                {
+                    "book_id": int(books[row]),
+                    "rank": rank,
+                    "neighbour_id": int(books[column]),
+                    "score": float(score),
+                }
+                for rank, (column, score) in enumerate(zip(columns, scores), start=1)
+            )
+        block_ids = [int(book_id) for book_id in books[block]]
+        db.exec(delete(BookNeighbour).where(BookNeighbour.book_id.in_(block_ids)))
+        if neighbours:
+            db.exec(insert(BookNeighbour), params=neighbours)
+        # One short transaction per block; readers see old or new rows per book
+        db.commit()
+
+    state.last_borrow_id = high_water
+    state.built_at = datetime.utcnow()
+    db.add(state)
+    db.commit()
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild related-book lists")
+    parser.add_argument(
+        "--full", action="store_true", help="Recompute every book, not only changed ones"
+    )
+    parser.add_argument("--top-k", type=int, default=RELATED_TOP_K)
+    parser.add_argument("--min-support", type=int, default=RELATED_MIN_SUPPORT)
+    parser.add_argument("--batch-size", type=int, default=RELATED_BATCH_SIZE)
+    args = parser.parse_args()
+
+    from database import all_engines
+
+    updated = 0
+    # Every branch database; each keeps its own watermark
+    for engine in all_engines():
+        with Session(engine) as db:
+            updated += build_related_books(
+                db,
+                full=args.full,
+                top_k=args.top_k,
+                min_support=args.min_support,
+                batch_size=args.batch_size,
+            )
+    print(f"Updated related books for {updated} titles")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# utils/scheduler.py
+import logging
+import os
+import threading
+import time
+
+from sqlmodel import Session
+
+logger = logging.getLogger("scheduler")
+
+# Set by server.py when running several workers on one host
+SCHEDULER_LOCK_FILE = os.getenv("SCHEDULER_LOCK_FILE")
+
+
+def _acquire_lock(path: str):
+    import fcntl
+
+    lock_file = open(path, "w")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return None
+    # The lock lasts as long as this file stays open (i.e. the process lives)
+    return lock_file
+
+
+class Scheduler:
+    """Runs periodic maintenance jobs on one background thread.
+
+    Jobs get their own session and run one at a time, so at most one
+    connection is taken from the pool and request threads are not blocked.
+    """
+
+    def __init__(self):
+        self._jobs = []
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock_file = None
+
+    def add_job(self, name: str, interval: float, func):
+        """`func(db)` runs every `interval` seconds, first after one interval."""
+        self._jobs.append({"name": name, "interval": interval, "func": func})
+
+    def start(self, *engines):
+        """Run the jobs against each engine in turn (one per branch database)."""
+        if self._thread is not None or not self._jobs:
+            return
+        if SCHEDULER_LOCK_FILE and self._lock_file is None:
+            self._lock_file = _acquire_lock(SCHEDULER_LOCK_FILE)
+            if self._lock_file is None:
+                logger.info("Scheduler already running in another worker")
+                return
+        self._stop.clear()
+        now = time.monotonic()
+        for job in self._jobs:
+            job["next_run"] = now + job["interval"]
+        self._thread = threading.Thread(
+            target=self._run, args=(engines,), name="scheduler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self, engines):
+        while not self._stop.is_set():
+            job = min(self._jobs, key=lambda job: job["next_run"])
+            if self._stop.wait(max(0.0, job["next_run"] - time.monotonic())):
+                return
+            for engine in engines:
+                try:
+                    with Session(engine) as db:
+                        job["func"](db)
+                except Exception:
+                    logger.exception("Scheduled job %s failed", job["name"])
+            job["next_run"] = time.monotonic() + job["interval"]
+
+
+scheduler = Scheduler()
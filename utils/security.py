@@ -1,27 +1,74 @@
 # utils/security.py
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
-from jose import jwt, JWTError
+from functools import lru_cache
 import os
-from dotenv import load_dotenv
+import threading
 
-load_dotenv()
+from utils.env import load_env
+
+load_env()
 
 
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
+
 
+# passlib/bcrypt, jose and multiprocessing are imported on first use rather
+# than at import time, which keeps worker start-up short.
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    from passlib.context import CryptContext
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
+
+
+_hash_pool = None
+_hash_pool_lock = threading.Lock()
+
+
+def _get_hash_pool():
+    global _hash_pool
+    with _hash_pool_lock:
+        if _hash_pool is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            # Server workers already run threads (audit writer, scheduler,
+            # threadpool); forking them could copy a held lock, so the pool
+            # starts fresh interpreters instead.
+            _hash_pool = ProcessPoolExecutor(
+                max_workers=PASSWORD_HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _hash_pool
+
+
+def shutdown_hash_pool():
+    global _hash_pool
+    with _hash_pool_lock:
+        if _hash_pool is not None:
+            _hash_pool.shutdown(cancel_futures=True)
+            _hash_pool = None
+
+
+def hash_passwords(passwords: list[str]) -> list[str]:
+    # bcrypt is CPU bound; large batches are spread over a process pool so
+    # throughput scales with cores. Small batches are not worth the IPC.
+    if len(passwords) < 2 * PASSWORD_HASH_WORKERS or PASSWORD_HASH_WORKERS == 1:
+        return [hash_password(password) for password in passwords]
+    pool = _get_hash_pool()
+    chunksize = max(1, len(passwords) // (PASSWORD_HASH_WORKERS * 4))
+    return list(pool.map(hash_password, passwords, chunksize=chunksize))
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
@@ -30,10 +77,14 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
         expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     )
     to_encode.update({"exp": expire})
+    from jose import jwt
+
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
 def verify_token(token: str):
+    from jose import jwt, JWTError
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         return payload